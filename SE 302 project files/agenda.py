@@ -0,0 +1,349 @@
+# agenda.py
+"""
+Compact student occupancy used by the solver.
+
+Every student has one row (a plain list of ints). For num_days = D:
+  row[d]     -> bitmask of occupied slots on day d (bit s = slot s busy)
+  row[D + d] -> number of exams the student has on day d
+
+A multi-slot exam sets several bits but counts as one exam, so the count
+cannot be derived from the mask and is stored next to it.
+
+The student-load rules (exams per day, free slots between exams, optional
+exams per 48 hours) live in a StudentRules object. For every exam length
+they are compiled into one table indexed by a student-day pattern,
+(exam count << slots_per_day) | busy slots, so the starts left on a day are
+a single lookup whatever rules are configured. Long days (more than
+FULL_TABLE_MAX_SLOTS slots) fill the table only for the patterns looked up.
+
+ArrayAgenda keeps the same data in NumPy arrays (optional dependency), so
+the legal starts of an exam with many students are found with a few array
+operations instead of a Python loop over the students.
+"""
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    np = None
+    HAS_NUMPY = False
+
+# default rules (ScheduleSystem.max_exams_per_day / min_gap_slots)
+MAX_EXAMS_PER_DAY = 2  # a student can take at most 2 exams per day
+MIN_GAP_SLOTS = 1      # at least one free slot between two exams of a student
+# days longer than this get their start tables filled one pattern at a time
+# (a full table has (max_per_day + 1) * 2 ** slots_per_day entries)
+FULL_TABLE_MAX_SLOTS = 12
+
+
+def exam_mask(start, num_slots):
+    """Bitmask of the slots [start, start + num_slots)."""
+    return ((1 << num_slots) - 1) << start
+
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+
+class StudentRules:
+    """
+    Limits on the exams of one student:
+      max_per_day -> exams on one day
+      min_gap     -> free slots between two exams on the same day
+      max_per_48h -> exams on two consecutive days (None = no limit)
+    Calendar days are the unit of the 48 hour window: an exam on day d counts
+    against both (d - 1, d) and (d, d + 1).
+    """
+
+    def __init__(self, max_per_day=MAX_EXAMS_PER_DAY, min_gap=MIN_GAP_SLOTS, max_per_48h=None):
+        self.max_per_day = max_per_day
+        self.min_gap = min_gap
+        self.max_per_48h = max_per_48h or None
+        self._tables = {}
+
+    def key(self):
+        return (self.max_per_day, self.min_gap, self.max_per_48h)
+
+    def __repr__(self):
+        return "StudentRules(max_per_day=%r, min_gap=%r, max_per_48h=%r)" % self.key()
+
+    def blocked_mask(self, start, num_slots):
+        """Slots an existing exam must not touch: the exam itself plus the gap around it."""
+        mask = exam_mask(start, num_slots)
+        blocked = mask
+        for g in range(1, self.min_gap + 1):
+            blocked |= (mask << g) | (mask >> g)
+        return blocked
+
+    def start_table(self, num_slots, slots_per_day):
+        """
+        table[(count << slots_per_day) | busy] = bitmask of the starts left on
+        a day with `count` exams in the slots `busy` (count capped at
+        max_per_day, whose patterns allow nothing). A list for up to
+        FULL_TABLE_MAX_SLOTS slots per day, above that a StartTable that
+        computes the patterns it is asked for.
+        """
+        key = (num_slots, slots_per_day)
+        table = self._tables.get(key)
+        if table is None:
+            blocked = [self.blocked_mask(s, num_slots) for s in range(slots_per_day - num_slots + 1)]
+            if slots_per_day > FULL_TABLE_MAX_SLOTS:
+                table = self._tables[key] = StartTable(blocked, self.max_per_day, slots_per_day)
+            else:
+                open_starts = [sum(1 << s for s, b in enumerate(blocked) if not busy & b)
+                               for busy in range(1 << slots_per_day)]
+                table = self._tables[key] = open_starts * self.max_per_day + [0] * (1 << slots_per_day)
+        return table
+
+    def pattern(self, count, busy, slots_per_day):
+        """Index of a student-day in start_table."""
+        return (min(count, self.max_per_day) << slots_per_day) | busy
+
+    def window_full(self, counts, day):
+        """True if one more exam on `day` breaks max_per_48h; counts = exams per day."""
+        limit = self.max_per_48h
+        if limit is None:
+            return False
+        here = counts[day]
+        if here >= limit:
+            return True
+        if day > 0 and here + counts[day - 1] >= limit:
+            return True
+        return day + 1 < len(counts) and here + counts[day + 1] >= limit
+
+    def day_penalty(self, entries):
+        """Violations of one student on one day; entries = [(start, num_slots, ...), ...]."""
+        k = len(entries)
+        if k < 2:
+            return 0
+        pen = k - self.max_per_day if k > self.max_per_day else 0
+        for i in range(k):
+            e1 = entries[i]
+            m1 = exam_mask(e1[0], e1[1])
+            for j in range(i + 1, k):
+                e2 = entries[j]
+                if self.blocked_mask(e2[0], e2[1]) & m1:
+                    pen += 1
+        return pen
+
+    def window_penalty(self, exams, next_exams):
+        """Violations of max_per_48h by two consecutive days of one student."""
+        if self.max_per_48h is None:
+            return 0
+        return max(0, exams + next_exams - self.max_per_48h)
+
+    def days_needed(self, exams, per_day):
+        """Fewest days for `exams` exams of one student, at most per_day (>= 1) a day."""
+        limit = self.max_per_48h
+        if limit is None or limit >= 2 * per_day:
+            return -(-exams // per_day)
+        # best pattern: first, limit - first, first, ... with first = min(per_day, limit)
+        first = min(per_day, limit)
+        days = 0
+        while exams > 0:
+            exams -= first if days % 2 == 0 else limit - first
+            days += 1
+        return days
+
+
+class StartTable(dict):
+    """start_table entries filled on first use, for days too long for a full table."""
+
+    def __init__(self, blocked, max_per_day, slots_per_day):
+        super().__init__()
+        self.blocked = blocked  # blocked_mask of every start
+        self.max_per_day = max_per_day
+        self.slots_per_day = slots_per_day
+
+    def __missing__(self, pattern):
+        busy = pattern & ((1 << self.slots_per_day) - 1)
+        starts = 0
+        if pattern >> self.slots_per_day < self.max_per_day:
+            starts = sum(1 << s for s, b in enumerate(self.blocked) if not busy & b)
+        self[pattern] = starts
+        return starts
+
+
+DEFAULT_RULES = StudentRules()
+
+
+class StudentAgenda:
+    def __init__(self, num_days, students=(), rules=DEFAULT_RULES):
+        self.num_days = num_days
+        self.rules = rules
+        self.rows = {}
+        for st in students:
+            self.rows[st] = [0] * (2 * num_days)
+
+    def row(self, student):
+        r = self.rows.get(student)
+        if r is None:
+            r = self.rows[student] = [0] * (2 * self.num_days)
+        return r
+
+    def fits(self, students, day, start, num_slots):
+        """True if none of the students breaks overlap / gap / per-day / 48h limits."""
+        rules = self.rules
+        blocked = rules.blocked_mask(start, num_slots)
+        count_idx = self.num_days + day
+        check_window = rules.max_per_48h is not None
+        rows = self.rows
+        for st in students:
+            r = rows.get(st)
+            if r is None:
+                continue
+            if r[count_idx] >= rules.max_per_day or r[day] & blocked:
+                return False
+            if check_window and rules.window_full(r[self.num_days:], day):
+                return False
+        return True
+
+    def allowed_starts(self, student, day, num_slots, slots_per_day):
+        """Bitmask of start slots on `day` where this student could take a num_slots exam."""
+        r = self.rows.get(student)
+        last_start = slots_per_day - num_slots
+        if last_start < 0:
+            return 0
+        if r is None:
+            return (1 << (last_start + 1)) - 1
+        rules = self.rules
+        if rules.max_per_48h is not None and rules.window_full(r[self.num_days:], day):
+            return 0
+        return rules.start_table(num_slots, slots_per_day)[
+            rules.pattern(r[self.num_days + day], r[day], slots_per_day)]
+
+    def start_mask(self, students, num_slots, slots_per_day):
+        """
+        Global bitmask (bit d * slots_per_day + s) of the starts where every
+        one of the students could take a num_slots exam: per day, the busy
+        slots of all students are OR-ed, the highest exam count is kept and
+        the pattern is looked up in the rules' start table.
+        """
+        num_days = self.num_days
+        rules = self.rules
+        check_window = rules.max_per_48h is not None
+        busy = [0] * num_days
+        most = [0] * num_days
+        full = 0  # days closed by max_per_48h
+        rows = self.rows
+        for st in students:
+            r = rows.get(st)
+            if r is None:
+                continue
+            for d in range(num_days):
+                busy[d] |= r[d]
+                if r[num_days + d] > most[d]:
+                    most[d] = r[num_days + d]
+            if check_window:
+                counts = r[num_days:]
+                for d in range(num_days):
+                    if rules.window_full(counts, d):
+                        full |= 1 << d
+        table = rules.start_table(num_slots, slots_per_day)
+        mask = 0
+        for d in range(num_days):
+            if not (full >> d) & 1:
+                mask |= table[rules.pattern(most[d], busy[d], slots_per_day)] << (d * slots_per_day)
+        return mask
+
+    def add(self, students, day, start, num_slots):
+        mask = exam_mask(start, num_slots)
+        count_idx = self.num_days + day
+        for st in students:
+            r = self.row(st)
+            r[day] |= mask
+            r[count_idx] += 1
+
+    def remove(self, students, day, start, num_slots):
+        keep = ~exam_mask(start, num_slots)
+        count_idx = self.num_days + day
+        rows = self.rows
+        for st in students:
+            r = rows[st]
+            r[day] &= keep
+            r[count_idx] -= 1
+
+
+class ArrayAgenda:
+    """
+    StudentAgenda on NumPy arrays for the students 0 .. num_students - 1:
+      busy[st, d]  -> bitmask of occupied slots on day d
+      count[st, d] -> number of exams on day d
+    students are passed as int sequences (array.array or lists) of row indices.
+    """
+
+    def __init__(self, num_days, num_students, rules=DEFAULT_RULES):
+        self.num_days = num_days
+        self.rules = rules
+        self.busy = np.zeros((num_students, num_days), dtype=np.int64)
+        self.count = np.zeros((num_students, num_days), dtype=np.int16)
+        self._tables = {}
+
+    def _table(self, num_slots, slots_per_day):
+        """start_table as an array, or None when it is filled per pattern (StartTable)."""
+        key = (num_slots, slots_per_day)
+        if key not in self._tables:
+            table = self.rules.start_table(num_slots, slots_per_day)
+            self._tables[key] = None if isinstance(table, StartTable) else np.array(table, dtype=np.int64)
+        return self._tables[key]
+
+    def _full_days(self, counts):
+        """Days on which one more exam breaks max_per_48h for some row of `counts`."""
+        limit = self.rules.max_per_48h
+        full = (counts >= limit).any(axis=0)
+        if self.num_days > 1:
+            over = ((counts[:, :-1] + counts[:, 1:]) >= limit).any(axis=0)
+            full[:-1] |= over
+            full[1:] |= over
+        return full
+
+    def fits(self, students, day, start, num_slots):
+        idx = np.asarray(students, dtype=np.intp)
+        rules = self.rules
+        if (self.count[idx, day] >= rules.max_per_day).any():
+            return False
+        if rules.max_per_48h is not None and self._full_days(self.count[idx])[day]:
+            return False
+        return not (self.busy[idx, day] & rules.blocked_mask(start, num_slots)).any()
+
+    def allowed_starts(self, student, day, num_slots, slots_per_day):
+        if slots_per_day < num_slots:
+            return 0
+        rules = self.rules
+        if rules.max_per_48h is not None and rules.window_full(self.count[student].tolist(), day):
+            return 0
+        return rules.start_table(num_slots, slots_per_day)[
+            rules.pattern(int(self.count[student, day]), int(self.busy[student, day]), slots_per_day)]
+
+    def start_mask(self, students, num_slots, slots_per_day):
+        """StudentAgenda.start_mask in one pass over the students' rows."""
+        idx = np.asarray(students, dtype=np.intp)
+        rules = self.rules
+        counts = self.count[idx]
+        busy = np.bitwise_or.reduce(self.busy[idx], axis=0)
+        most = np.minimum(counts.max(axis=0, initial=0), rules.max_per_day).astype(np.int64)
+        patterns = (most << slots_per_day) | busy
+        table = self._table(num_slots, slots_per_day)
+        if table is None:
+            lookup = rules.start_table(num_slots, slots_per_day)
+            allowed = np.array([lookup[p] for p in patterns.tolist()], dtype=np.int64)
+        else:
+            allowed = table[patterns]
+        if rules.max_per_48h is not None:
+            allowed[self._full_days(counts)] = 0
+        return bits_to_int(allowed, slots_per_day)
+
+    def add(self, students, day, start, num_slots):
+        idx = np.asarray(students, dtype=np.intp)
+        self.busy[idx, day] |= exam_mask(start, num_slots)
+        self.count[idx, day] += 1
+
+    def remove(self, students, day, start, num_slots):
+        idx = np.asarray(students, dtype=np.intp)
+        self.busy[idx, day] &= ~exam_mask(start, num_slots)
+        self.count[idx, day] -= 1
+
+
+def bits_to_int(values, width):
+    """Python int with values[i] (each < 2 ** width) at bit i * width."""
+    bits = (values[:, None] >> np.arange(width)) & 1
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel(), bitorder="little").tobytes(), "little")
@@ -0,0 +1,163 @@
+# benchmark.py
+"""
+Small benchmark runner for the scheduling logic.
+
+Uses the sample data under docs/SCENARIO_* and scales it up synthetically,
+so we can see how the solver building blocks behave on faculty-sized inputs.
+
+Usage:
+    python benchmark.py conflicts [--factor 1 5 20] [--scenario SCENARIO_2]
+    python benchmark.py memory [--factor 1 20 100] [--scenario SCENARIO_2]
+"""
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+from collections import defaultdict
+
+import data_access
+from models import Course
+from logic import ScheduleSystem
+from problem import ProblemInstance
+
+DOCS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "docs")
+
+
+# ---------------- DATA ----------------
+def load_scenario(name):
+    """Returns (courses, classrooms) for a docs/<name> folder."""
+    folder = os.path.join(DOCS_DIR, name)
+    files = {f.lower(): os.path.join(folder, f) for f in os.listdir(folder)}
+    courses = data_access.read_attendance_from_file(files["sampledata_allattendancelists.csv"])
+    classrooms = data_access.read_classrooms_from_file(files["sampledata_allclassroomsandtheircapacities.csv"])
+    return courses, classrooms
+
+
+def scaled_enrollments(courses, factor):
+    """
+    Replicate the course list `factor` times, yielding (code, student IDs).
+    Copy k renames every student, shifting them across copies so that copies
+    still share students with each other (like one faculty with many parallel
+    programs). The per-student course load stays the same, total enrollments
+    grow linearly. Every ID is a new string, as when parsed from a file.
+    """
+    students = sorted({st for c in courses for st in c.students})
+    pos = {st: i for i, st in enumerate(students)}
+    for k in range(factor):
+        for c in courses:
+            yield f"{c.code}#{k}", [f"{st}#{(k + pos[st]) % factor}" for st in c.students]
+
+
+def scale_courses(courses, factor):
+    return [Course(code, ids) for code, ids in scaled_enrollments(courses, factor)]
+
+
+def make_system(courses, classrooms):
+    system = ScheduleSystem(use_db=False)
+    system.courses = courses
+    system.classrooms = classrooms
+    return system
+
+
+def timed(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+# ---------------- CONFLICT GRAPH ----------------
+def pairwise_conflict_matrix(courses):
+    """The original O(C^2 * S) builder, kept here as the reference."""
+    conflict_matrix = defaultdict(set)
+    for i in range(len(courses)):
+        for j in range(i + 1, len(courses)):
+            if not set(courses[i].students).isdisjoint(courses[j].students):
+                conflict_matrix[courses[i].code].add(courses[j].code)
+                conflict_matrix[courses[j].code].add(courses[i].code)
+    return conflict_matrix
+
+
+def bench_conflicts(args):
+    base_courses, classrooms = load_scenario(args.scenario)
+    print(f"Conflict graph build on {args.scenario}")
+    print(f"{'factor':>6} {'courses':>8} {'enroll':>8} {'edges':>8} {'pairwise s':>11} {'compiled s':>11} {'speedup':>8}")
+    for factor in args.factor:
+        courses = scale_courses(base_courses, factor)
+        system = make_system(courses, classrooms)
+        enrollments = sum(len(c.students) for c in courses)
+
+        # a fresh ProblemInstance each time: the system caches the compiled graph
+        t_new = timed(lambda: ProblemInstance(courses, classrooms).conflicts())
+        system.build_conflict_matrix()
+        ref = {}
+        t_old = timed(lambda: ref.update(m=pairwise_conflict_matrix(courses)), repeat=1)
+
+        got = {k: v for k, v in system.conflict_matrix.items() if v}
+        assert got == {k: v for k, v in ref["m"].items() if v}, "conflict graphs differ"
+        edges = sum(len(v) for v in got.values()) // 2
+        print(f"{factor:>6} {len(courses):>8} {enrollments:>8} {edges:>8} "
+              f"{t_old:>11.4f} {t_new:>11.4f} {t_old / max(t_new, 1e-9):>7.1f}x")
+
+
+# ---------------- MEMORY ----------------
+class LegacyCourse:
+    """The original Course layout (list of unique IDs plus a per-instance __dict__), kept as the reference."""
+    def __init__(self, code, student_ids=None, duration=None):
+        self.code = code
+        self.students = list(set(student_ids or []))
+        self._explicit_duration = duration is not None
+        self.duration = int(duration) if duration is not None else 60
+
+
+def traced_size(build):
+    """Bytes still allocated by the object build() returns (kept alive while measuring)."""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+def bench_memory(args):
+    base_courses, classrooms = load_scenario(args.scenario)
+    print(f"Course storage footprint on {args.scenario}")
+    print(f"{'factor':>6} {'courses':>8} {'enroll':>9} {'legacy MB':>10} {'slots MB':>9} "
+          f"{'B/enr old':>9} {'B/enr new':>9} {'compiled MB':>12}")
+    for factor in args.factor:
+        enrollments = sum(len(c.students) for c in base_courses) * factor
+        legacy = traced_size(lambda: [LegacyCourse(code, ids) for code, ids in scaled_enrollments(base_courses, factor)])
+        compact = traced_size(lambda: scale_courses(base_courses, factor))
+        courses = scale_courses(base_courses, factor)
+        compiled = traced_size(lambda: ProblemInstance(courses, classrooms))
+        print(f"{factor:>6} {len(base_courses) * factor:>8} {enrollments:>9} {legacy / 1e6:>10.2f} {compact / 1e6:>9.2f} "
+              f"{legacy / enrollments:>9.1f} {compact / enrollments:>9.1f} {compiled / 1e6:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ExamTable Manager benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("conflicts", help="conflict graph builder: pairwise vs compiled inverted index")
+    p.add_argument("--scenario", default="SCENARIO_2")
+    p.add_argument("--factor", type=int, nargs="+", default=[1, 5, 20, 50])
+    p.set_defaults(func=bench_conflicts)
+
+    p = sub.add_parser("memory", help="Course storage: list + __dict__ vs __slots__ + interned tuples")
+    p.add_argument("--scenario", default="SCENARIO_2")
+    p.add_argument("--factor", type=int, nargs="+", default=[1, 20, 100])
+    p.set_defaults(func=bench_memory)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
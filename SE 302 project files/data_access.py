@@ -108,6 +108,7 @@ def read_attendance_from_file(filepath):
     Returns Course objects populated with student lists.
     """
     courses = []
+    by_code = {}
     content = ""
     for enc in ['utf-8', 'cp1254', 'latin-1']:
         try:
@@ -135,15 +136,15 @@ def read_attendance_from_file(filepath):
                 students_in_line = re.findall(r"['\"]([^'\"]+)['\"]", line)
                 
                 if students_in_line:
-                    existing = next((c for c in courses if c.code == current_code), None)
+                    existing = by_code.get(current_code)
                     if existing:
-                        existing.students.extend(students_in_line)
-                        existing.students = list(set(existing.students))
+                        existing.students = existing.students + tuple(students_in_line)
                         # Update duration if specified
                         if current_duration is not None:
                             existing.duration = current_duration
                     else:
-                        courses.append(Course(current_code, students_in_line, current_duration))
+                        by_code[current_code] = Course(current_code, students_in_line, current_duration)
+                        courses.append(by_code[current_code])
         else:
             # This line doesn't contain student IDs, so it's a course code line
             # Skip common header patterns
@@ -3,7 +3,6 @@ from tkinter import ttk, filedialog, messagebox
 import threading
 import csv
 import re
-import time
 from datetime import datetime, timedelta
 
 # PDF Export Imports (Code 2'den alındı)
@@ -119,6 +118,31 @@ class ExamSchedulerApp:
         self.btn_find_min = ttk.Button(bottom_area, text="FIND MIN SLOTS", style="Big.Accent.TButton", command=self.find_minimum_slots)
         self.btn_find_min.pack(side='left', padx=8, ipadx=14, ipady=6)
 
+        # Solver engine selection
+        tk.Label(bottom_area, text="Solver:", bg=self.colors["bg_white"]).pack(side='left', padx=(20, 5))
+        self.solver_engines = {
+            "Backtracking": {},
+            "Backtracking (MRV + Backjumping)": {"ordering": "dynamic", "backjumping": True},
+            "Backtracking (Two-phase rooms)": {"ordering": "dynamic", "backjumping": True, "two_phase": True},
+            "Backtracking (Luby restarts)": {"ordering": "dynamic", "backjumping": True, "restarts": "luby"},
+            "Parallel Portfolio": {"engine": "portfolio"},
+            "Local Search": {"engine": "local_search"},
+            "Components (parallel)": {"engine": "components", "ordering": "dynamic", "backjumping": True},
+            "Hierarchical (day, then slot)": {"engine": "hierarchical", "ordering": "dynamic", "backjumping": True},
+            "Repair (keep current schedule)": {"engine": "repair", "ordering": "dynamic", "backjumping": True},
+        }
+        self.engine_var = tk.StringVar(value="Backtracking")
+        ttk.Combobox(bottom_area, textvariable=self.engine_var, values=list(self.solver_engines),
+                     state='readonly', width=30).pack(side='left')
+        # cross-listed courses (same students) sit one exam together
+        self.merge_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(bottom_area, text="Merge cross-listed courses", variable=self.merge_var).pack(side='left', padx=(10, 0))
+        # seconds spent improving spread / rooms / late exams after a schedule is found (0 = off)
+        tk.Label(bottom_area, text="Improve (s):", bg=self.colors["bg_white"]).pack(side='left', padx=(10, 5))
+        self.ent_optimize = ttk.Entry(bottom_area, width=5)
+        self.ent_optimize.insert(0, "0")
+        self.ent_optimize.pack(side='left')
+
         self.lbl_log = tk.Label(self.tab_config, text="", bg=self.colors["bg_white"], fg=self.colors["primary"])
         self.lbl_log.pack(side='bottom', pady=(0, 5))
 
@@ -303,6 +327,25 @@ class ExamSchedulerApp:
                                font=('Segoe UI', 9, 'bold'), relief='flat', padx=10, command=self.remove_slot)
         btn_remove.pack(side='right')
 
+        # Student load rules - Row 5
+        rules_frame = tk.Frame(frame_time, bg="#eceff1", pady=5, padx=10)
+        rules_frame.grid(row=5, column=0, sticky='ew')
+
+        tk.Label(rules_frame, text="Exams/day:", bg="#eceff1").pack(side='left', padx=5)
+        self.ent_max_per_day = ttk.Entry(rules_frame, width=4)
+        self.ent_max_per_day.insert(0, str(self.system.max_exams_per_day))
+        self.ent_max_per_day.pack(side='left')
+
+        tk.Label(rules_frame, text="Min gap (slots):", bg="#eceff1").pack(side='left', padx=(10, 5))
+        self.ent_min_gap = ttk.Entry(rules_frame, width=4)
+        self.ent_min_gap.insert(0, str(self.system.min_gap_slots))
+        self.ent_min_gap.pack(side='left')
+
+        tk.Label(rules_frame, text="Exams/48h (0 = off):", bg="#eceff1").pack(side='left', padx=(10, 5))
+        self.ent_max_per_48h = ttk.Entry(rules_frame, width=4)
+        self.ent_max_per_48h.insert(0, str(self.system.max_exams_per_48h or 0))
+        self.ent_max_per_48h.pack(side='left')
+
         # --- Activity Log ---
         log_frame = tk.LabelFrame(right_col, text="Activity Log", **lf_style)
         log_frame.pack(side='top', fill='both', expand=True)
@@ -574,16 +617,38 @@ class ExamSchedulerApp:
                 days_val = 7
 
             self.system.num_days = days_val
+            self.system.total_slots = None
             self.system.slots_per_day = len(self.slot_times)
             self.system.slot_duration_minutes = slot_duration_minutes
+            self.apply_student_rules()
+            try:
+                self.optimize_sec = max(0, int(self.ent_optimize.get() or 0))
+            except ValueError:
+                self.optimize_sec = 0
 
             self.lbl_log.config(text="Calculating...")
             self.lbl_log.config(text="Process running...")
+            self.append_log(f"Solver: {self.engine_var.get()}")
             self.btn_start.config(state='disabled')
             self.btn_stop.config(state='normal')
             threading.Thread(target=self.run_logic, daemon=True).start()
         except Exception as e: messagebox.showerror("Error", str(e))
 
+    def apply_student_rules(self):
+        """Copy the student load rules from the settings into the system (ValueError on bad input)."""
+        max_per_day = int(self.ent_max_per_day.get())
+        min_gap = int(self.ent_min_gap.get())
+        max_per_48h = int(self.ent_max_per_48h.get() or 0)
+        if max_per_day < 1 or min_gap < 0 or max_per_48h < 0:
+            raise ValueError("Exams/day must be at least 1, min gap and exams/48h cannot be negative.")
+        self.system.max_exams_per_day = max_per_day
+        self.system.min_gap_slots = min_gap
+        self.system.max_exams_per_48h = max_per_48h or None
+        rules = f"{max_per_day} exams/day, gap {min_gap} slot(s)"
+        if max_per_48h:
+            rules += f", {max_per_48h} exams/48h"
+        self.append_log(f"Student rules: {rules}")
+
     def stop_process(self):
         self.system.stop_event.set()
         self.lbl_log.config(text="Stopping...")
@@ -621,14 +686,8 @@ class ExamSchedulerApp:
             except:
                 slot_duration_minutes = 60
 
-            try:
-                days_val = int(self.ent_days.get())
-            except:
-                days_val = 7
-
-            # Get initial total slots (days * slots_per_day)
             slots_per_day = len(self.slot_times)
-            initial_total_slots = days_val * slots_per_day
+            self.apply_student_rules()
 
             self.append_log("Finding minimum slots needed...")
             self.lbl_log.config(text="Finding minimum slots...")
@@ -637,53 +696,33 @@ class ExamSchedulerApp:
             self.btn_find_min.config(state='disabled')
             
             # Start the process in a thread
-            threading.Thread(target=self.run_find_min_slots, args=(initial_total_slots, slots_per_day, slot_duration_minutes), daemon=True).start()
+            threading.Thread(target=self.run_find_min_slots, args=(slots_per_day, slot_duration_minutes), daemon=True).start()
             
         except Exception as e:
             messagebox.showerror("Error", str(e))
             self.append_log(f"Error in find_minimum_slots: {str(e)}")
 
-    def run_find_min_slots(self, initial_total_slots, slots_per_day, slot_duration_minutes):
-        """Thread function to iteratively find minimum slots"""
-        current_total_slots = initial_total_slots
-        found = False
-        attempt = 0
-        
-        while not found:
-            attempt += 1
-            # Calculate days needed for current total slots
-            current_days = (current_total_slots + slots_per_day - 1) // slots_per_day  # Ceiling division
-            
-            # Update system parameters
-            self.system.num_days = current_days
-            self.system.slots_per_day = slots_per_day
-            self.system.slot_duration_minutes = slot_duration_minutes
-            
-            # Log the attempt
-            log_msg = f"Attempt {attempt}: Trying {current_total_slots} total slots ({current_days} days × {slots_per_day} slots/day)"
-            self.root.after(0, lambda msg=log_msg: self.append_log(msg))
-            self.root.after(0, lambda: self.lbl_log.config(text=f"Testing {current_total_slots} slots..."))
-            
-            # Try to solve with current configuration
-            success, msg = self.system.solve(time_limit_sec=5)
-            
-            if success:
-                found = True
-                result_msg = f"✓ RECOMMENDED SLOTS: {current_total_slots} ({current_days} days × {slots_per_day} slots/day)"
-                self.root.after(0, lambda: self.finish_find_min_slots(True, result_msg, current_total_slots, current_days))
-                return
-            
-            # Increase slots by 20
-            current_total_slots += 20
-            
-            # Safety limit to prevent infinite loop
-            if current_total_slots > 500:
-                result_msg = "Could not find feasible schedule within reasonable limits (max 500 slots tested)"
-                self.root.after(0, lambda: self.finish_find_min_slots(False, result_msg, 0, 0))
-                return
-            
-            # Wait 0.5 seconds before next attempt
-            time.sleep(0.5)
+    def run_find_min_slots(self, slots_per_day, slot_duration_minutes):
+        """Thread function: lower bound + galloping / binary search over total slots"""
+        self.system.slot_duration_minutes = slot_duration_minutes
+        attempts = []
+
+        def on_probe(total_slots, success, msg):
+            attempts.append(total_slots)
+            days = (total_slots + slots_per_day - 1) // slots_per_day
+            log_msg = (f"Attempt {len(attempts)}: {total_slots} total slots ({days} days × {slots_per_day} slots/day) -> "
+                       f"{'feasible' if success else msg.splitlines()[0]}")
+            self.root.after(0, lambda m=log_msg: self.append_log(m))
+            self.root.after(0, lambda t=total_slots: self.lbl_log.config(text=f"Tested {t} slots..."))
+
+        try:
+            success, msg, total_slots, days = self.system.find_minimum_slots(
+                slots_per_day, time_limit_sec=5, max_total_slots=500, progress_callback=on_probe)
+        except Exception as e:
+            success, msg, total_slots, days = False, f"CRASH PREVENTED: {e}", 0, 0
+        if success:
+            msg = f"✓ RECOMMENDED SLOTS: {msg.split(': ', 1)[1]}"
+        self.root.after(0, lambda: self.finish_find_min_slots(success, msg, total_slots, days))
 
     def finish_find_min_slots(self, success, msg, total_slots, days):
         """Callback when find_minimum_slots completes"""
@@ -709,7 +748,10 @@ class ExamSchedulerApp:
             messagebox.showerror("Failed", msg)
 
     def run_logic(self):
-        success, msg = self.system.solve()
+        options = dict(self.solver_engines.get(self.engine_var.get(), {}))
+        options["merge_cross_listed"] = self.merge_var.get()
+        options["optimize_sec"] = self.optimize_sec
+        success, msg = self.system.solve(**options)
         self.root.after(0, lambda: self.finish_solver(success, msg))
 
     def finish_solver(self, success, msg):
@@ -724,6 +766,10 @@ class ExamSchedulerApp:
             self.append_log(f"Schedule generation finished: SUCCESS - {msg}")
 
         else:
+            if self.system.unscheduled:
+                # the deepest partial schedule of the search is kept: show it
+                self.refresh_table()
+                self.append_log(f"Partial schedule: {len(self.system.unscheduled)} courses left unscheduled")
             if "timeout" in msg.lower():
                 messagebox.showwarning(
                     "Timeout",
@@ -804,7 +850,7 @@ class ExamSchedulerApp:
         
         # If course_code is provided and has explicit duration, calculate actual exam duration
         if course_code:
-            course = next((c for c in self.system.courses if c.code == course_code), None)
+            course = self.system.get_course(course_code)
             if course and s < len(self.slot_times):
                 # Check if course has explicit duration from file
                 if hasattr(course, '_explicit_duration') and course._explicit_duration:
@@ -926,7 +972,7 @@ class ExamSchedulerApp:
         if mode == "General Schedule":
             # Populate general schedule tree
             for c_code, (d, s, rooms) in self.system.assignments.items():
-                c = next((x for x in self.system.courses if x.code == c_code), None)
+                c = self.system.get_course(c_code)
                 st_cnt = len(c.students) if c else 0
                 r_names = ", ".join([r.code for r in rooms])
                 cap = f"{st_cnt} / {sum(r.capacity for r in rooms)}"
@@ -953,7 +999,7 @@ class ExamSchedulerApp:
             day_groups = defaultdict(list)
             for c_code, (d, s, rooms) in self.system.assignments.items():
                 date = (self.start_date + timedelta(days=d)).strftime('%Y-%m-%d')
-                c = next((x for x in self.system.courses if x.code == c_code), None)
+                c = self.system.get_course(c_code)
                 
                 if c and s < len(self.slot_times):
                     if hasattr(c, '_explicit_duration') and c._explicit_duration:
@@ -1139,18 +1185,13 @@ class ExamSchedulerApp:
                     writer.writerow(cols)
                     
                     # Get all students who are enrolled in any course (from attendance)
-                    enrolled_students = set()
-                    for course in self.system.courses:
-                        for student in course.students:
-                            enrolled_students.add(student)
+                    enrolled_students = set(self.system.problem.student_ids)
                     
+                    problem = self.system.problem
                     students_sorted = sorted(all_students)
                     for student_id in students_sorted:
                         # Find courses this student is enrolled in
-                        student_courses = []
-                        for course in self.system.courses:
-                            if student_id in course.students:
-                                student_courses.append(course.code)
+                        student_courses = problem.courses_of_student(student_id)
                         
                         exam_count = len(student_courses)
                         if exam_count > 0:
@@ -1352,12 +1393,10 @@ class ExamSchedulerApp:
                 headers = ["Student ID", "Enrolled Courses", "Exam Count", "Status"]
                 data_rows = []
                 
+                problem = self.system.problem
                 students_sorted = sorted(all_students)
                 for student_id in students_sorted:
-                    student_courses = []
-                    for course in self.system.courses:
-                        if student_id in course.students:
-                            student_courses.append(course.code)
+                    student_courses = problem.courses_of_student(student_id)
                     
                     exam_count = len(student_courses)
                     if exam_count > 0:
@@ -1725,7 +1764,7 @@ class ExamSchedulerApp:
         attendance_frame.pack(fill='both', expand=True, padx=6, pady=6)
 
         # Find the course
-        course = next((c for c in self.system.courses if c.code == course_code), None)
+        course = self.system.get_course(course_code)
         if not course:
             lbl = tk.Label(attendance_frame, text=f"Course '{course_code}' not found.", 
                           bg=self.colors["bg_white"], fg=self.colors["text_body"])
@@ -1826,10 +1865,7 @@ class ExamSchedulerApp:
             return
 
         # Get all students who are enrolled in any course (from attendance)
-        enrolled_students = set()
-        for course in self.system.courses:
-            for student in course.students:
-                enrolled_students.add(student)
+        enrolled_students = set(self.system.problem.student_ids)
 
         # Calculate stats
         enrolled_count = len(enrolled_students)
@@ -1875,13 +1911,11 @@ class ExamSchedulerApp:
         tbl.column("Status", width=150, anchor='center')
 
         # Populate table with all students
+        problem = self.system.problem
         students_sorted = sorted(all_students)
         for student_id in students_sorted:
             # Find courses this student is enrolled in
-            student_courses = []
-            for course in self.system.courses:
-                if student_id in course.students:
-                    student_courses.append(course.code)
+            student_courses = problem.courses_of_student(student_id)
             
             exam_count = len(student_courses)
             if exam_count > 0:
@@ -0,0 +1,307 @@
+# local_search.py
+"""
+Simulated-annealing engine for large instances.
+
+Starts from a greedy assignment and minimizes the number of violated hard
+constraints instead of searching exhaustively. Every move is applied through
+add/remove operations that return their own cost change, so a move is scored
+by touching only the students and rooms of the exams it moves (no full
+re-check of the schedule).
+
+Moves:
+  - shift:  move one exam to another start, re-picking its rooms
+  - kempe:  swap the Kempe chain of two starts on the conflict graph
+  - rooms:  swap the room sets of two exams with the same span
+"""
+import math
+import random
+import time
+from collections import defaultdict
+
+# cost weights
+W_STUDENT = 1.0    # one student clash (overlap / no gap / too many exams on a day or in 48 hours)
+W_ROOM = 1.0       # one room booked twice in one slot
+W_SEATS = 1.0      # an exam without enough seats ...
+W_SEAT_UNIT = 0.01  # ... plus a little for every missing seat
+
+
+class Annealer:
+    """
+    Simulated-annealing loop shared by LocalSearch and
+    optimizer.ScheduleOptimizer. Subclasses have rng and iterations, moves
+    that apply themselves and return (delta, old) or None, and undo(old).
+    """
+
+    def done(self):
+        """True when nothing is left to improve."""
+        return False
+
+    def accepted(self):
+        """Called after every accepted move."""
+
+    def anneal(self, moves, start, deadline, t_start, t_end, stop_event=None, progress_callback=None):
+        """
+        Random moves from `moves` until done(), the deadline or a stop
+        request; worse moves pass with probability exp(-delta / temperature).
+        progress_callback(iterations, elapsed) is called every 1000 iterations.
+        """
+        total = max(deadline - start, 1e-6)
+        temperature = t_start
+        while not self.done():
+            self.iterations += 1
+            if self.iterations % 200 == 0:
+                now = time.time()
+                if now > deadline or (stop_event is not None and stop_event.is_set()):
+                    break
+                # geometric cooling over the time budget
+                temperature = t_start * (t_end / t_start) ** min(1.0, (now - start) / total)
+                if progress_callback and self.iterations % 1000 == 0:
+                    progress_callback(self.iterations, now - start)
+            result = self.rng.choice(moves)()
+            if result is None:
+                continue
+            delta, old = result
+            if delta <= 0 or self.rng.random() < math.exp(-delta / temperature):
+                self.accepted()
+                continue
+            self.undo(old)
+
+
+class LocalSearch(Annealer):
+    def __init__(self, system, seed=None):
+        self.system = system
+        self.rng = random.Random(seed)
+        self.num_days = system.num_days
+        self.rules = system.student_rules()
+
+        problem = system.problem
+        self.courses = problem.courses
+        self.index = problem.course_index
+        lengths = problem.lengths(system.slot_duration_minutes)
+        self.length = [lengths[c.code] for c in self.courses]
+        self.size = problem.size
+        self.students = [problem.classes_of(i) for i in range(len(self.courses))]  # enrollment classes
+        self.class_size = problem.class_size  # a class clash counts once per student in it
+        self.neighbours = [[self.index[o] for o in system.conflict_matrix[c.code] if o in self.index]
+                           for c in self.courses]
+
+        self.rooms = sorted(system.classrooms, key=lambda r: -r.capacity)
+        self.room_cap = [r.capacity for r in self.rooms]
+
+        # legal starts for every exam length
+        self.starts = {}
+        for n in set(self.length):
+            self.starts[n] = [(d, s) for d in range(self.num_days) for s in range(system.day_slots(d) - n + 1)]
+
+        self.pos = [None] * len(self.courses)          # (day, start) or None
+        self.room_of = [[] for _ in self.courses]       # room indices
+        self.student_day = defaultdict(list)            # (class, day) -> [(start, n, course idx)]
+        self.day_pen = defaultdict(int)                 # (class, day) -> penalty of the day and the 48h window from it
+        self.bad_keys = []                              # (class, day) keys with a penalty ...
+        self.bad_pos = {}                               # ... and their position, for O(1) removal
+        self.room_use = defaultdict(int)                # (day, slot, room idx) -> bookings
+        self.by_start = defaultdict(set)                # (day, start) -> course indices
+        self.cost = 0.0
+        self.iterations = 0
+
+    # ---------------- INCREMENTAL COST ----------------
+    def _day_penalty(self, st, d):
+        entries = self.student_day.get((st, d), ())
+        pen = self.rules.day_penalty(entries)
+        if self.rules.max_per_48h is not None and (d + 1 < self.num_days or d == 0):
+            # window (d, d + 1); a one-day calendar has the window (0,) only
+            pen += self.rules.window_penalty(len(entries), len(self.student_day.get((st, d + 1), ())))
+        return pen
+
+    def _update_days(self, st, d):
+        """Recompute class st after its day d changed (and day d - 1 with a 48h limit); returns the penalty change."""
+        delta = self._update_day((st, d))
+        if self.rules.max_per_48h is not None and d > 0:
+            delta += self._update_day((st, d - 1))
+        return delta
+
+    def _update_day(self, key):
+        """Recompute one class-day; returns the penalty change."""
+        before = self.day_pen[key]
+        after = self._day_penalty(*key)
+        if after == before:
+            return 0
+        self.day_pen[key] = after
+        if after and not before:
+            self.bad_pos[key] = len(self.bad_keys)
+            self.bad_keys.append(key)
+        elif before and not after:
+            pos = self.bad_pos.pop(key)
+            last = self.bad_keys.pop()
+            if last != key:
+                self.bad_keys[pos] = last
+                self.bad_pos[last] = pos
+        return after - before
+
+    def _seat_cost(self, i, rooms):
+        missing = self.size[i] - sum(self.room_cap[r] for r in rooms)
+        return W_SEATS + W_SEAT_UNIT * missing if missing > 0 else 0.0
+
+    def remove(self, i):
+        """Take exam i out of the schedule; returns the cost change."""
+        d, s = self.pos[i]
+        n = self.length[i]
+        delta = 0.0
+        for st in self.students[i]:
+            key = (st, d)
+            self.student_day[key].remove((s, n, i))
+            delta += W_STUDENT * self.class_size[st] * self._update_days(st, d)
+        for k in range(n):
+            for r in self.room_of[i]:
+                key = (d, s + k, r)
+                if self.room_use[key] >= 2:
+                    delta -= W_ROOM
+                self.room_use[key] -= 1
+        delta -= self._seat_cost(i, self.room_of[i])
+        self.by_start[(d, s)].discard(i)
+        self.pos[i] = None
+        self.cost += delta
+        return delta
+
+    def add(self, i, d, s, rooms=None):
+        """Put exam i at (d, s); rooms=None picks free rooms. Returns the cost change."""
+        n = self.length[i]
+        if rooms is None:
+            rooms = self.pick_rooms(i, d, s)
+        delta = 0.0
+        for st in self.students[i]:
+            key = (st, d)
+            self.student_day[key].append((s, n, i))
+            delta += W_STUDENT * self.class_size[st] * self._update_days(st, d)
+        for k in range(n):
+            for r in rooms:
+                key = (d, s + k, r)
+                if self.room_use[key] >= 1:
+                    delta += W_ROOM
+                self.room_use[key] += 1
+        delta += self._seat_cost(i, rooms)
+        self.pos[i] = (d, s)
+        self.room_of[i] = rooms
+        self.by_start[(d, s)].add(i)
+        self.cost += delta
+        return delta
+
+    def pick_rooms(self, i, d, s):
+        """Largest free rooms first until the exam is covered (all free rooms if it cannot be)."""
+        need = self.size[i]
+        n = self.length[i]
+        picked, cap = [], 0
+        for r in range(len(self.rooms)):
+            if any(self.room_use[(d, s + k, r)] for k in range(n)):
+                continue
+            picked.append(r)
+            cap += self.room_cap[r]
+            if cap >= need:
+                break
+        return picked
+
+    # ---------------- CONSTRUCTION ----------------
+    def greedy_start(self):
+        """Place exams one by one (most conflicted first) at their cheapest start."""
+        order = sorted(range(len(self.courses)), key=lambda i: (len(self.neighbours[i]), self.size[i]), reverse=True)
+        for i in order:
+            best, best_delta = None, None
+            starts = self.starts[self.length[i]]
+            for d, s in self.rng.sample(starts, len(starts)):
+                delta = self.add(i, d, s)
+                self.remove(i)
+                if best_delta is None or delta < best_delta:
+                    best, best_delta = (d, s), delta
+                    if delta == 0:
+                        break
+            if best is None:
+                return False
+            self.add(i, *best)
+        return True
+
+    # ---------------- MOVES ----------------
+    def pick_exam(self):
+        """Half of the time an exam that takes part in a student clash, otherwise any exam."""
+        if self.bad_keys and self.rng.random() < 0.5:
+            st, d = self.rng.choice(self.bad_keys)
+            # a 48h violation can leave day d empty, the exams are on day d + 1 then
+            entries = self.student_day[(st, d)] or self.student_day[(st, d + 1)]
+            return self.rng.choice(entries)[2]
+        return self.rng.randrange(len(self.courses))
+
+    def move_shift(self):
+        i = self.pick_exam()
+        starts = self.starts[self.length[i]]
+        if len(starts) < 2:
+            return None
+        old = self.pos[i], self.room_of[i]
+        target = self.rng.choice(starts)
+        if target == old[0]:
+            return None
+        delta = self.remove(i) + self.add(i, *target)
+        return delta, [(i, old)]
+
+    def move_rooms(self):
+        i = self.rng.randrange(len(self.courses))
+        same = [j for j in self.by_start[self.pos[i]] if j != i and self.length[j] == self.length[i]]
+        if not same:
+            return None
+        j = self.rng.choice(same)
+        old_i, old_j = (self.pos[i], self.room_of[i]), (self.pos[j], self.room_of[j])
+        delta = self.remove(i) + self.remove(j)
+        delta += self.add(i, old_i[0][0], old_i[0][1], old_j[1])
+        delta += self.add(j, old_j[0][0], old_j[0][1], old_i[1])
+        return delta, [(i, old_i), (j, old_j)]
+
+    def move_kempe(self):
+        """Swap every exam of the Kempe chain of i between start p and a start q."""
+        i = self.pick_exam()
+        p = self.pos[i]
+        q = self.rng.choice(self.starts[self.length[i]])
+        if q == p:
+            return None
+        chain, stack = {i}, [i]
+        while stack:
+            a = stack.pop()
+            other = q if self.pos[a] == p else p
+            for b in self.neighbours[a]:
+                if b not in chain and self.pos[b] == other:
+                    chain.add(b)
+                    stack.append(b)
+        for a in chain:
+            target = q if self.pos[a] == p else p
+            if target[1] + self.length[a] > self.system.day_slots(target[0]):
+                return None
+        old = [(a, (self.pos[a], self.room_of[a])) for a in chain]
+        delta = sum(self.remove(a) for a, _ in old)
+        for a, (start, _) in old:
+            target = q if start == p else p
+            delta += self.add(a, *target)
+        return delta, old
+
+    def undo(self, old):
+        for a, _ in old:
+            self.remove(a)
+        for a, (start, rooms) in old:
+            self.add(a, start[0], start[1], rooms)
+
+    # ---------------- DRIVER ----------------
+    def done(self):
+        return self.cost <= 1e-9
+
+    def run(self, deadline, stop_event=None, progress_callback=None, t_start=1.0, t_end=0.01):
+        """Simulated annealing until the cost reaches 0, the deadline or a stop request."""
+        start = time.time()
+        if not self.greedy_start():
+            return False
+        moves = (self.move_shift, self.move_shift, self.move_kempe, self.move_rooms)
+        self.anneal(moves, start, deadline, t_start, t_end, stop_event, progress_callback)
+        return self.done()
+
+    def violations(self):
+        return round(self.cost)
+
+    def export(self):
+        """Assignments in ScheduleSystem form: code -> (day, start, [Classroom])."""
+        return {c.code: (self.pos[i][0], self.pos[i][1], [self.rooms[r] for r in self.room_of[i]])
+                for i, c in enumerate(self.courses)}
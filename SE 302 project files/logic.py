@@ -1,19 +1,70 @@
+import contextlib
 import threading
 import time
 import random
+import heapq
+import itertools
 from collections import defaultdict
 import data_access
+import room_packing
 import os
 import sys
 from db import DB
 from models import Course, Classroom
+from problem import ProblemInstance, slots_needed
+from agenda import (StudentAgenda, ArrayAgenda, StudentRules, HAS_NUMPY, bits_to_int, popcount,
+                    MAX_EXAMS_PER_DAY, MIN_GAP_SLOTS)
 
+if HAS_NUMPY:
+    import numpy as np
 
 
+def luby(i):
+    """i-th term (from 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ..."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while i != (1 << k) - 1:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+
+class _ChoicePoint:
+    """One open node of the search: its course, the starts left and the undo log of the current start."""
+    __slots__ = ("course", "slots_needed", "starts", "conflicts", "day", "slot", "rooms", "trail")
+
+    def __init__(self, course, slots_needed):
+        self.course = course
+        self.slots_needed = slots_needed
+        self.trail = self.rooms = None
+
+
+class _Search:
+    """
+    A backtracking run: the courses, the student agenda and the stack of open
+    choice points. kept = how many bottom entries of the stack still match
+    ScheduleSystem.partial.
+    """
+    __slots__ = ("course_list", "agenda", "start_time", "stack", "kept")
+
+    def __init__(self, course_list, agenda, start_time):
+        self.course_list = course_list
+        self.agenda = agenda
+        self.start_time = start_time
+        self.stack = []
+        self.kept = 0
+
 
 class ScheduleSystem:
-    def __init__(self):
+    def __init__(self, use_db=True):
         self.reset_data()
+        self.db = None
+        if not use_db:
+            # solver worker processes only need the scheduling logic
+            return
         if getattr(sys, "frozen", False):
             app_dir = os.path.join(os.environ.get("APPDATA", os.path.expanduser("~")), "ExamtableManager")
         else:
@@ -25,6 +76,15 @@ class ScheduleSystem:
         self.db = DB(db_path)
 
     def reset_data(self):
+        # compiled data (problem.ProblemInstance) per (data_version, merged
+        # followers), kept until invalidate(); set before courses/classrooms,
+        # whose setters invalidate it
+        self.data_version = 0
+        self._problems = {}
+        self._problem = None
+        self._problem_key = None
+        self._merged = frozenset()  # followers left out by leads_only
+
         self.courses = []
         self.classrooms = []
         self.all_students_list = set()
@@ -32,23 +92,130 @@ class ScheduleSystem:
         self.num_days = 7
         self.slots_per_day = 4
         self.slot_duration_minutes = 60  # Default slot duration in minutes (can be set from GUI)
+        # optional cap on the total number of slots; the last day is cut short to match
+        self.total_slots = None
+        # student-load rules (can be set from GUI); max_exams_per_48h counts two
+        # consecutive days, None / 0 = no limit. Compiled by student_rules().
+        self.max_exams_per_day = MAX_EXAMS_PER_DAY
+        self.min_gap_slots = MIN_GAP_SLOTS
+        self.max_exams_per_48h = None
+        self._rules = None
 
         self.assignments = {}
         self.student_room_map = {}
 
-        self.room_schedule = defaultdict(set)
         self.conflict_matrix = defaultdict(set)
-
-        self.room_usage_count = defaultdict(int)
-        self.slot_usage_count = defaultdict(int)
+        # conflict_weights[a][b] = number of students taking both a and b
+        self.conflict_weights = defaultdict(dict)
+        # inverted index: enrollment class -> list of course codes (problem.class_courses)
+        self.class_courses = []
+        self.course_by_code = {}
+        # per solve: course code -> enrollment classes / slots needed
+        self.exam_students = {}
+        self.exam_length = {}
+
+        # room index: classrooms by capacity (largest first, bit i = rooms_by_capacity[i]),
+        # free-room bitset per global slot and a cache (students, free mask) -> room bits
+        self.rooms_by_capacity = []
+        self.room_capacities = []
+        self._room_bit = {}
+        self.free_rooms = []
+        self.room_cache = {}
+        self.ROOM_CACHE_LIMIT = 200_000
+        # two-phase solve: free seats per global slot in phase one, and room cuts:
+        # (code, day, slot) -> [frozenset of (code, day, slot)] combinations phase two
+        # proved cannot share the rooms
+        self.two_phase = False
+        self.free_seats = []
+        self.seat_capacity = None  # seats per slot for phase one; None = all classrooms
+        self.room_cuts = defaultdict(list)
+        self.MAX_ROOM_ROUNDS = 200
+        # value ordering: legal starts per exam length (bit g = d * slots_per_day + s),
+        # exams per global slot and usage_buckets[u] = slots used by exactly u exams
+        self.candidate_masks = {}
+        self.slot_usage = []
+        self.usage_buckets = [0]
+        # without forward checking every node masks its starts in one batch
+        # (agenda.start_mask); with NumPy and a course of at least
+        # VECTORIZE_MIN_STUDENTS agenda rows the agenda is an ArrayAgenda and
+        # free_capacity[g] (seats of the free rooms) masks the rooms too.
+        # vectorize: None = decide per solve, True / False = always / never
+        self.vectorize = None
+        self.VECTORIZE_MIN_STUDENTS = 64
+        self.free_capacity = None
 
         self.iteration_count = 0
         self.MAX_ITERATIONS = 200_000
+        # nodes allowed in the current run (MAX_ITERATIONS, or less with restarts)
+        self.node_limit = self.MAX_ITERATIONS
+
+        # private RNG for tie-breaks (solve(seed=...) makes a run reproducible)
+        self.rng = random.Random()
+        # restarts: None, "luby" (RESTART_BASE * 1, 1, 2, 1, 1, 2, 4, ... nodes per run)
+        # or "geometric" (RESTART_BASE * RESTART_GROWTH ** run); nogoods, room cuts and
+        # fail_count (dead ends per course, hardest first after a restart) carry over
+        self.restarts = None
+        self.RESTART_BASE = 100
+        self.RESTART_GROWTH = 1.5
+        self.restart_count = 0
+        self.fail_count = defaultdict(int)
 
         self.stop_event = threading.Event()
         self.deadline = None
+        # explicit-stack search (_backtrack): kept after pause() so resume() can continue it
+        self.pause_event = threading.Event()
+        self._search = None
+        self.room_workers = 1
+        # deepest partial assignment of the current solve, [(code, day, slot, rooms)]
+        # in placement order; loaded by keep_partial() when the search fails, with
+        # unscheduled: course code -> scheduled neighbours that block it
+        self.partial = []
+        self.unscheduled = {}
+        # repair mode: code -> (day, slot, [Classroom]) placed before the search and never moved
+        self.fixed = {}
 
         self.progress_callback = None  # GUI için
+        self.score_callback = None
+
+        # forward checking: course code -> bitmask of feasible starts (bit = d * slots_per_day + s)
+        self.forward_checking = False
+        self.domains = {}
+        self.solver_stats = {}
+
+        # variable ordering: "static" (sorted once) or "dynamic" (MRV / DSATUR)
+        self.ordering = "static"
+        self._order_heap = []
+        self._order_version = {}
+        self._order_rank = {}
+        self._neighbour_days = {}
+        self._saturation = {}
+
+        # conflict-directed backjumping and learned nogoods
+        self.backjumping = False
+        self.warm_start = {}
+        self.conflict_set = None
+        self.wiped_course = None
+        self.slot_courses = defaultdict(set)
+        # watched literal (code, day, slot, room codes) -> [[literals, blocked course code, hits]];
+        # every nogood is filed under one of its literals that does not hold
+        self.nogoods = defaultdict(list)
+        self.nogood_count = 0
+        self.NOGOOD_MAX_SIZE = 32
+        self.NOGOOD_LIMIT = 10_000  # when full, the nogoods that never fired are dropped
+        # learning stops for the solve when the nogoods learned in a window of
+        # NOGOOD_PROBE fire less than NOGOOD_MIN_HITS times per nogood
+        self.NOGOOD_PROBE = 2_000
+        self.NOGOOD_MIN_HITS = 0.1
+        self.nogood_learning = True
+        self._nogood_probe = (0, 0)  # (nogoods learned, hits) when the current probe started
+        self._literals = {}  # code -> (assignment, literal) of placed exams
+
+        # symmetry breaking: cross-listed courses (same students, same length) are
+        # placed in code order, twins[code] = (earlier codes, later codes); with
+        # single-slot exams only, nogoods name room capacities instead of rooms
+        self.symmetry_breaking = True
+        self.twins = {}
+        self.room_symmetry = False
 
     # ---------------- FILE LOADERS ----------------
     def load_classrooms_regex(self, filepath):
@@ -64,9 +231,10 @@ class ScheduleSystem:
             # will usually have empty student lists; attendance upload is the primary
             # way to populate student lists.
             loaded = data_access.read_courses_from_file(filepath)
+            by_code = {x.code: x for x in self.courses}
             # Merge or replace existing course entries' duration info
             for c in loaded:
-                existing = next((x for x in self.courses if x.code == c.code), None)
+                existing = by_code.get(c.code)
                 if existing:
                     # If loaded course has explicit duration, update existing
                     if hasattr(c, '_explicit_duration') and c._explicit_duration:
@@ -75,6 +243,8 @@ class ScheduleSystem:
                 else:
                     # keep as course with no students (attendance may be loaded later)
                     self.courses.append(c)
+                    by_code[c.code] = c
+            self.invalidate()
             return f"SUCCESS: {len(loaded)} courses (durations optional)."
         except Exception as e:
             return f"ERROR: {e}"
@@ -83,9 +253,10 @@ class ScheduleSystem:
         try:
             # Attendance file is mandatory for scheduling: it provides per-course student lists
             loaded = data_access.read_attendance_from_file(filepath)
+            by_code = {x.code: x for x in self.courses}
             # Merge durations from any previously loaded simple courses
             for c in loaded:
-                existing = next((x for x in self.courses if x.code == c.code), None)
+                existing = by_code.get(c.code)
                 if existing and hasattr(existing, '_explicit_duration') and existing._explicit_duration:
                     c.duration = existing.duration
                     c._explicit_duration = True
@@ -106,11 +277,96 @@ class ScheduleSystem:
     def stop(self):
         self.stop_event.set()
 
-    def set_progress_callback(self, func):
+    def pause(self):
+        """Pause the backtracking search at the next node; resume() continues it."""
+        self.pause_event.set()
+
+    def set_progress_callback(self, func, score_func=None):
         """
-        func(iteration_count, elapsed_time)
+        func(iteration_count, elapsed_time) is called while a solver runs;
+        while optimize() runs score_func(best_score) gets the best score so far.
         """
         self.progress_callback = func
+        self.score_callback = score_func
+
+    # --------------- CALENDAR HELPERS ----------------
+    def day_slots(self, day):
+        """Usable slots on `day`; only the last day can be cut short by total_slots."""
+        if self.total_slots is not None and day == self.num_days - 1:
+            return self.total_slots - day * self.slots_per_day
+        return self.slots_per_day
+
+    def total_slot_count(self):
+        if self.total_slots is not None:
+            return self.total_slots
+        return self.num_days * self.slots_per_day
+
+    def student_rules(self):
+        """agenda.StudentRules for the current settings; its start tables are kept while they do not change."""
+        key = (self.max_exams_per_day, self.min_gap_slots, self.max_exams_per_48h or None)
+        if self._rules is None or self._rules.key() != key:
+            self._rules = StudentRules(*key)
+        return self._rules
+
+    # --------------- COMPILED DATA ----------------
+    @property
+    def courses(self):
+        return self._courses
+
+    @courses.setter
+    def courses(self, courses):
+        self._courses = courses
+        self.invalidate()
+
+    @property
+    def classrooms(self):
+        return self._classrooms
+
+    @classrooms.setter
+    def classrooms(self, classrooms):
+        self._classrooms = classrooms
+        self.invalidate()
+
+    def invalidate(self):
+        """
+        The loaded data changed: drop the compiled problems (and with them the
+        conflict graph). Assigning courses / classrooms and the loaders call
+        it; call it after editing a course or a room in place (students,
+        duration, capacity), e.g. before solve_repair.
+        """
+        self.data_version += 1
+        self._problems = {}
+        self._problem = None
+
+    @property
+    def problem(self):
+        """ProblemInstance for the loaded data (leads only inside leads_only); built once per data_version."""
+        key = (self.data_version, self._merged)
+        if self._problem is None or key != self._problem_key:
+            problem = self._problems.get(key)
+            if problem is None:
+                problem = self._problems[key] = ProblemInstance(self._courses, self._classrooms)
+            self._problem, self._problem_key = problem, key
+        return self._problem
+
+    @contextlib.contextmanager
+    def leads_only(self, followers):
+        """
+        Schedule only the lead courses while the block runs: the courses in
+        `followers` (merged cross-listed courses) are left out. The reduced
+        problem stays cached, so merging again costs no rebuild.
+        """
+        all_courses, merged = self._courses, self._merged
+        self._courses = [c for c in all_courses if c.code not in followers]
+        self._merged = merged | frozenset(followers)
+        try:
+            yield
+        finally:
+            self._courses, self._merged = all_courses, merged
+            self.build_conflict_matrix()
+
+    def get_course(self, code):
+        return self.problem.course(code)
 
     # --------------- MULTI-SLOT DURATION HELPERS ----------------
     def get_slots_needed(self, course):
@@ -118,20 +374,17 @@ class ScheduleSystem:
         Calculate how many consecutive slots are needed for an exam.
         - If course has explicit duration from file: use that duration
         - If no explicit duration: each exam = 1 slot (user's configured slot duration)
+        Cached per course in the compiled problem.
         """
-        import math
-        # Check if duration was explicitly set in course file
-        if hasattr(course, '_explicit_duration') and course._explicit_duration:
-            # Use course's explicitly set duration
-            return max(1, math.ceil(course.duration / self.slot_duration_minutes))
-        else:
-            # No explicit duration - each exam fits in exactly 1 slot
-            return 1
+        problem = self._problem
+        if problem is not None and problem.course_by_code.get(course.code) is course:
+            return problem.lengths(self.slot_duration_minutes)[course.code]
+        return slots_needed(course, self.slot_duration_minutes)
 
     # ---- VALIDATION ----------------
-    def validate_feasibility(self):
+    def validate_feasibility(self, reuse_conflicts=False):
         # Account for multi-slot exams when computing total slot availability
-        total_time_slots = self.num_days * self.slots_per_day
+        total_time_slots = self.total_slot_count()
         total_capacity = sum(r.capacity for r in self.classrooms)
         
         # Sum of (students per exam * slots needed per exam)
@@ -139,94 +392,337 @@ class ScheduleSystem:
         
         if total_slot_demand > total_time_slots * total_capacity:
             return False, "IMPOSSIBLE: capacity insufficient for exam durations"
+
+        problems = self.preflight(reuse_conflicts)
+        if problems:
+            return False, "IMPOSSIBLE (preflight):\n- " + "\n- ".join(problems)
         return True, "OK"
 
-    def build_conflict_matrix(self):
-        self.conflict_matrix.clear()
-        for i in range(len(self.courses)):
-            for j in range(i + 1, len(self.courses)):
-                if not set(self.courses[i].students).isdisjoint(self.courses[j].students):
-                    self.conflict_matrix[self.courses[i].code].add(self.courses[j].code)
-                    self.conflict_matrix[self.courses[j].code].add(self.courses[i].code)
-
-    # ---- CONSTRAINTS ----------------
-    def check_constraints(self, course, day, slot, student_agenda):
-        """
-        Check if a course can be assigned to a specific starting slot on a day.
-        The exam spans multiple slots if needed.
-        Respects:
-          - No back-to-back exams (adjacent slots)
-          - Max 2 exams per student per day
-          - No overlapping exams
-        """
-        slots_needed = self.get_slots_needed(course)
-        
-        # Verify all needed slots fit within the day
-        if slot + slots_needed > self.slots_per_day:
-            return False
-        
-        # New exam occupies slots [slot, slot + slots_needed)
-        new_exam_slots = set(range(slot, slot + slots_needed))
-        
-        # Check for student conflicts across all slots this exam will occupy
-        for student in course.students:
-            exam_list = student_agenda[student][day]
-            
-            # exam_list now contains tuples: (start_slot, num_slots)
-            # Student can have at most 1 other exam on the same day
-            if len(exam_list) >= 2:
-                return False
-            
-            # Check no overlap or adjacency with existing exams
-            for existing_start, existing_slots in exam_list:
-                existing_slots_set = set(range(existing_start, existing_start + existing_slots))
-                
-                # Check overlap
-                if new_exam_slots & existing_slots_set:
-                    return False
-                
-                # Check adjacency (no back-to-back): must have gap of at least 1 slot
-                existing_end = existing_start + existing_slots - 1
-                new_end = slot + slots_needed - 1
-                
-                # Back-to-back means the exams touch or are 1 slot apart
-                if abs(existing_start - new_end) <= 1 or abs(slot - existing_end) <= 1:
-                    return False
-        
-        return True
+    # ---- PREFLIGHT (LOWER BOUNDS) ----------------
+    def preflight(self, reuse_conflicts=False):
+        """
+        Cheap necessary conditions checked before any search. Builds the
+        conflict graph and returns a list of failed bounds (empty = no proof
+        of infeasibility found):
+          - exam longer than a day / larger than all classrooms together
+          - clique bound: exams sharing students pairwise need distinct,
+            non-adjacent slots
+          - per-student bound: max exams per day (and per 48 hours) over the days
+        """
+        if not reuse_conflicts or not self.conflict_matrix:
+            self.build_conflict_matrix()
+        problems = []
 
-    # ---- ROOMS ----------------
-    def find_rooms(self, course, day, slot):
-        """Find classrooms for the course. Rooms must be available for all slots the exam occupies."""
-        slots_needed = self.get_slots_needed(course)
-        
-        # Check which rooms are available for all slots this exam needs
-        available = []
-        for r in self.classrooms:
-            available_for_all = True
-            for s in range(slot, slot + slots_needed):
-                if r.code in self.room_schedule[(day, s)]:
-                    available_for_all = False
+        total_capacity = sum(r.capacity for r in self.classrooms)
+        for c in self.courses:
+            n = self.get_slots_needed(c)
+            if n > self.slots_per_day:
+                problems.append(f"exam length: {c.code} needs {n} consecutive slots, a day has {self.slots_per_day}")
+            if len(c.students) > total_capacity:
+                problems.append(f"room capacity: {c.code} has {len(c.students)} students, all classrooms seat {total_capacity}")
+        if problems:
+            return problems
+
+        bounds = self.lower_bounds()
+        days_needed, clique = bounds["clique"]
+        if days_needed > self.num_days:
+            problems.append(
+                f"clique bound: {len(clique)} exams share students pairwise "
+                f"({self._fmt_list(clique, limit=6)}), so they need at least {days_needed} days "
+                f"with {self.slots_per_day} slots per day; only {self.num_days} days configured")
+
+        days_needed, student, count = bounds["student"]
+        if days_needed > self.num_days:
+            rules = self.student_rules()
+            limits = f"{rules.max_per_day} per day"
+            if rules.max_per_48h is not None:
+                limits += f" and {rules.max_per_48h} per 48 hours"
+            problems.append(
+                f"per-student bound: student {student} has {count} exams and can take at most "
+                f"{limits}, so at least {days_needed} days are needed; "
+                f"only {self.num_days} days configured")
+        return problems
+
+    def lower_bounds(self):
+        """
+        Lower bounds on the number of days, for the current slots_per_day.
+        Returns {"clique": (days, codes), "student": (days, student_id, exam_count)}.
+        """
+        rules = self.student_rules()
+        gap = rules.min_gap
+        length = {c.code: self.get_slots_needed(c) for c in self.courses}
+
+        # Exams of one clique on one day need sum(length) + gap * (k - 1) <= slots_per_day.
+        # Summed over all days: sum(length + gap) <= days * (slots_per_day + gap); and a
+        # day holds at most as many clique exams as its shortest ones that fit.
+        clique = self.greedy_max_clique()
+        clique_days = 0
+        if clique:
+            units = sum(length[code] + gap for code in clique)
+            clique_days = -(-units // (self.slots_per_day + gap))
+            per_day, used = 0, -gap
+            for n in sorted(length[code] for code in clique):
+                used += n + gap
+                if used > self.slots_per_day:
                     break
-            if available_for_all:
-                available.append(r)
+                per_day += 1
+            if per_day:
+                clique_days = max(clique_days, -(-len(clique) // per_day))
+
+        student_days, worst_student, worst_count = 0, None, 0
+        for k, codes in enumerate(self.class_courses):
+            lens = sorted(length[code] for code in codes)
+            per_day, used = 0, -gap
+            for n in lens[:rules.max_per_day]:
+                used += n + gap
+                if used > self.slots_per_day:
+                    break
+                per_day += 1
+            days = rules.days_needed(len(codes), per_day) if per_day else len(codes) * self.num_days + 1
+            if days > student_days:
+                student_days, worst_student, worst_count = days, k, len(codes)
+        if worst_student is not None:
+            problem = self.problem
+            worst_student = problem.student_ids[problem.class_rep[worst_student]]
+
+        return {"clique": (clique_days, clique), "student": (student_days, worst_student, worst_count)}
+
+    def greedy_max_clique(self, starts=16):
+        """
+        Large clique of the conflict graph: from each of the highest-degree
+        courses, keep adding the candidate that leaves the most candidates.
+        Any clique gives a valid lower bound; the exact maximum is not needed.
+        """
+        graph = self.conflict_matrix
+        codes = sorted((c.code for c in self.courses), key=lambda code: len(graph[code]), reverse=True)
+        best = []
+        for v in codes[:starts]:
+            if len(graph[v]) + 1 <= len(best):
+                break
+            clique = [v]
+            candidates = set(graph[v])
+            while candidates:
+                u = max(candidates, key=lambda code: len(graph[code] & candidates))
+                clique.append(u)
+                candidates &= graph[u]
+            if len(clique) > len(best):
+                best = clique
+        return best
+
+    def build_conflict_matrix(self):
+        """
+        Build the course conflict graph using a student -> courses inverted index.
+        Instead of comparing every pair of courses, each enrollment class (the
+        students with one course set) contributes an edge between every pair of
+        its courses, so the cost follows the distinct course sets, not C^2 * S.
+        Fills:
+          - conflict_matrix[a]   : set of course codes sharing a student with a
+          - conflict_weights[a][b]: number of shared students (edge weight)
+          - class_courses[k]     : list of course codes of enrollment class k
+        The graph is built once per data set by the compiled problem.
+        """
+        self.conflict_matrix, self.conflict_weights, self.class_courses = self.problem.conflicts()
+
+    # ---- FORWARD CHECKING ----------------
+    def init_domains(self, courses):
+        """Every course starts with all starts that fit inside a day."""
+        self.domains = {c.code: self.candidate_masks[self.exam_length[c.code]] for c in courses}
+
+    # ---- CANDIDATE STARTS ----------------
+    def init_candidates(self, courses):
+        """
+        Legal starts for every exam length, computed once per solve, and an
+        empty usage bucket queue (every slot in bucket 0).
+        """
+        spd = self.slots_per_day
+        self.candidate_masks = {}
+        for n in {self.exam_length[c.code] for c in courses}:
+            mask = 0
+            for d in range(self.num_days):
+                last_start = self.day_slots(d) - n
+                if last_start >= 0:
+                    mask |= ((1 << (last_start + 1)) - 1) << (d * spd)
+            self.candidate_masks[n] = mask
+        self.slot_usage = [0] * (self.num_days * spd)
+        self.usage_buckets = [(1 << len(self.slot_usage)) - 1]
+
+    def _bump_usage(self, g, delta):
+        """Move global slot g to the next/previous usage bucket."""
+        u = self.slot_usage[g]
+        bit = 1 << g
+        self.usage_buckets[u] &= ~bit
+        u += delta
+        if u == len(self.usage_buckets):
+            self.usage_buckets.append(0)
+        self.usage_buckets[u] |= bit
+        self.slot_usage[g] = u
+
+    def ordered_starts(self, mask):
+        """
+        Global starts in `mask`, least used start slot first (ties: earliest).
+        The buckets are copied up front, so placements made while the caller
+        iterates do not change the order.
+        """
+        return self._iter_bits([b & mask for b in self.usage_buckets])
 
-        available.sort(key=lambda r: (self.room_usage_count[r.code], -r.capacity))
+    @staticmethod
+    def _iter_bits(masks):
+        for mask in masks:
+            while mask:
+                low = mask & -mask
+                yield low.bit_length() - 1
+                mask ^= low
 
-        selected, cap = [], 0
-        for r in available:
-            selected.append(r)
-            cap += r.capacity
-            if cap >= len(course.students):
-                return selected
+    def forward_check(self, course, day, student_agenda):
+        """
+        After `course` was placed on `day`, remove the starts on that day which
+        became illegal for its unassigned neighbours. Only the enrollment classes
+        of `course` changed, so only their rows are re-checked.
+        Returns (trail, consistent): trail holds the old domains for undo,
+        consistent is False as soon as a neighbour has no start left.
+        """
+        trail = {}
+        # with a 48 hour limit the exam also closes the days next to it
+        days = [day]
+        if self.student_rules().max_per_48h is not None:
+            days = [d for d in (day - 1, day, day + 1) if 0 <= d < self.num_days]
+        exam_length = self.exam_length
+        for st in self.exam_students[course.code]:
+            allowed_by_len = {}
+            for code in self.class_courses[st]:
+                if code in self.assignments:
+                    continue
+                n = exam_length[code]
+                old = new = self.domains[code]
+                for d in days:
+                    allowed = allowed_by_len.get((n, d))
+                    if allowed is None:
+                        shift = d * self.slots_per_day
+                        day_bits = ((1 << self.slots_per_day) - 1) << shift
+                        allowed = allowed_by_len[(n, d)] = ~day_bits | (
+                            student_agenda.allowed_starts(st, d, n, self.day_slots(d)) << shift)
+                    new &= allowed
+                if new != old:
+                    if code not in trail:
+                        trail[code] = old
+                    self.domains[code] = new
+                    self.solver_stats["pruned"] += 1
+                    if not new:
+                        self.solver_stats["wipeouts"] += 1
+                        self.wiped_course = code
+                        return trail, False
+        return trail, True
+
+    def restore_domains(self, trail):
+        self.domains.update(trail)
+
+    # ---- DYNAMIC ORDERING (MRV / DSATUR) ----------------
+    def init_ordering(self, courses):
+        """
+        Lazy priority queue over unassigned courses, keyed by
+        (remaining starts, -days used by neighbours, -degree, static rank).
+        Whenever a key changes a new entry is pushed with a newer version;
+        outdated entries are skipped when popped, so picking a course never
+        rescans the whole course list.
+        """
+        self._order_heap = []
+        self._order_version = {}
+        self._order_rank = {c.code: i for i, c in enumerate(courses)}
+        self._neighbour_days = {c.code: [0] * self.num_days for c in courses}
+        self._saturation = {c.code: 0 for c in courses}
+        for c in courses:
+            self._push_course(c.code)
+
+    def _push_course(self, code):
+        version = self._order_version.get(code, 0) + 1
+        self._order_version[code] = version
+        heapq.heappush(self._order_heap, (
+            popcount(self.domains[code]),
+            -self._saturation[code],
+            -len(self.conflict_matrix[code]),
+            self._order_rank[code],
+            code,
+            version,
+        ))
+
+    def _requeue(self, codes):
+        for code in codes:
+            if code not in self.assignments:
+                self._push_course(code)
+
+    def pick_next_course(self):
+        heap = self._order_heap
+        if len(heap) > 8 * len(self._order_rank) + 1000:
+            # drop outdated entries before the heap grows without bound
+            heap[:] = [e for e in heap if e[4] not in self.assignments and e[5] == self._order_version[e[4]]]
+            heapq.heapify(heap)
+        while heap:
+            entry = heapq.heappop(heap)
+            code = entry[4]
+            if code in self.assignments or entry[5] != self._order_version[code]:
+                continue
+            return self.course_by_code[code]
         return None
 
+    def update_saturation(self, course, day, delta):
+        """Track on how many distinct days each course already has an assigned neighbour."""
+        for code in self.conflict_matrix[course.code]:
+            days = self._neighbour_days.get(code)
+            if days is None:  # kept in place (repair mode)
+                continue
+            before = days[day]
+            days[day] = before + delta
+            if (before == 0) != (days[day] == 0):
+                self._saturation[code] += 1 if delta > 0 else -1
+                if code not in self.assignments:
+                    self._push_course(code)
+
+    # ---- ROOMS ----------------
+    def init_rooms(self):
+        """Every room free in every slot; rooms sorted once, largest first."""
+        self.rooms_by_capacity = sorted(self.classrooms, key=lambda r: -r.capacity)
+        self.room_capacities = [r.capacity for r in self.rooms_by_capacity]
+        self._room_bit = {r.code: 1 << i for i, r in enumerate(self.rooms_by_capacity)}
+        self.free_rooms = [(1 << len(self.rooms_by_capacity)) - 1] * (self.num_days * self.slots_per_day)
+        self.room_cache = {}
+
+    def find_rooms(self, course, day, slot):
+        """Find classrooms for the course. Rooms must be available for all slots the exam occupies."""
+        slots_needed = self.exam_length[course.code]
+
+        # rooms free for all slots this exam needs
+        g = day * self.slots_per_day + slot
+        free = self.free_rooms[g]
+        for k in range(1, slots_needed):
+            free &= self.free_rooms[g + k]
+
+        key = (len(course.students), free)
+        picked = self.room_cache.get(key)
+        if picked is None:
+            # () = cannot be covered (None means "not cached yet")
+            picked = room_packing.cover(self.room_capacities, len(course.students), free) or ()
+            if len(self.room_cache) >= self.ROOM_CACHE_LIMIT:
+                self.room_cache.clear()
+            self.room_cache[key] = picked
+        if not picked:
+            return None
+        return [self.rooms_by_capacity[i] for i in picked]
+
+    def seats_fit(self, course, g, slots_needed):
+        """Phase one of the two-phase solve: enough free seats (in any rooms) in every slot."""
+        need = len(course.students)
+        free_seats = self.free_seats
+        for k in range(slots_needed):
+            if free_seats[g + k] < need:
+                return False
+        return True
+
     # ---- DISTRIBUTION ----------------
     def distribute_students(self):
         self.student_room_map.clear()
 
         for c_code, (d, s, rooms) in self.assignments.items():
-            course = next((c for c in self.courses if c.code == c_code), None)
+            course = self.problem.course(c_code)
             if not course:
                 continue
 
@@ -239,62 +735,1088 @@ class ScheduleSystem:
                     idx += 1
 
     # ---------------- SOLVER ----------------
-    def solve(self, time_limit_sec=25):
+    def solve(self, time_limit_sec=25, forward_checking=False, ordering="static", backjumping=False,
+              engine="backtracking", warm_start=None, reuse_conflicts=False, two_phase=False, room_workers=1,
+              symmetry_breaking=True, merge_cross_listed=False, seed=None, restarts=None, optimize_sec=0):
+        """
+        engine: "backtracking" (below), "portfolio" (solve_portfolio),
+        "local_search" (solve_local_search), "components" (solve_components)
+        or "hierarchical" (solve_hierarchical).
+        forward_checking: keep a live domain of feasible starts for every
+        unassigned course and backtrack as soon as one of them becomes empty.
+        ordering: "static" sorts courses once (size, conflict degree);
+        "dynamic" picks, at every node, the course with the fewest feasible
+        starts left (ties: most days used by neighbours, DSATUR-style).
+        Dynamic ordering needs the live domains, so it turns on forward checking.
+        backjumping: on a dead end jump straight back to the deepest assignment
+        that caused it, and learn the failing combination as a nogood.
+        warm_start: {code: (day, slot)} tried first for each course (e.g. a
+        previous schedule).
+        reuse_conflicts: keep the conflict graph from the previous call
+        (only valid while the loaded courses have not changed).
+        two_phase: search days/slots against the total seat count of each
+        slot only, then pack rooms slot cluster by slot cluster (room_workers
+        processes). A cluster that cannot be packed is shrunk to a minimal
+        unpackable set of exams, that combination is forbidden and the
+        timetable is searched again, starting from the last one. The packer
+        is a heuristic, so when it gives up, or no timetable is left under
+        its cuts, the search goes on without two_phase (exact_rooms).
+        symmetry_breaking: place cross-listed courses (identical students and
+        length) in code order instead of trying them in every order, and let
+        nogoods match any rooms of the same capacities when every exam is one
+        slot long.
+        merge_cross_listed: schedule each group of cross-listed courses as one
+        exam (solve_merged).
+        seed: seeds the private RNG that breaks ties between equally ranked
+        courses; the same seed gives the same search. self.courses is never
+        reordered.
+        restarts: "luby" or "geometric" stops a run after a growing number of
+        nodes and starts over with new tie-breaks, hardest courses first;
+        learned nogoods and room cuts are kept.
+        engine="repair" (solve_repair) re-solves the current assignments
+        after a data change, moving as few exams as it can.
+        optimize_sec: after a schedule is found, spend up to this long
+        improving its soft constraints (optimize()).
+        """
+        if optimize_sec:
+            success, msg = self.solve(time_limit_sec, forward_checking=forward_checking, ordering=ordering,
+                                      backjumping=backjumping, engine=engine, warm_start=warm_start,
+                                      reuse_conflicts=reuse_conflicts, two_phase=two_phase,
+                                      room_workers=room_workers, symmetry_breaking=symmetry_breaking,
+                                      merge_cross_listed=merge_cross_listed, seed=seed, restarts=restarts)
+            if not success or self.stop_event.is_set():
+                return success, msg
+            stats = self.solver_stats
+            _, opt_msg = self.optimize(optimize_sec, seed=seed)
+            self.solver_stats = dict(stats, **self.solver_stats)
+            return True, f"{msg}; {opt_msg}"
+        if engine == "repair":  # keeps the merged groups of the current schedule (merged_followers)
+            return self.solve_repair(time_limit_sec, forward_checking=forward_checking,
+                                     ordering=ordering, backjumping=backjumping, seed=seed, restarts=restarts)
+        if merge_cross_listed:
+            return self.solve_merged(time_limit_sec, forward_checking=forward_checking, ordering=ordering,
+                                     backjumping=backjumping, engine=engine, warm_start=warm_start,
+                                     two_phase=two_phase, room_workers=room_workers,
+                                     symmetry_breaking=symmetry_breaking, seed=seed, restarts=restarts)
+        if engine == "portfolio":
+            return self.solve_portfolio(time_limit_sec, seed=seed)
+        if engine == "local_search":
+            return self.solve_local_search(time_limit_sec, seed=seed)
+        if engine == "components":
+            return self.solve_components(time_limit_sec, forward_checking=forward_checking,
+                                         ordering=ordering, backjumping=backjumping, seed=seed, restarts=restarts)
+        if engine == "hierarchical":
+            return self.solve_hierarchical(time_limit_sec, forward_checking=forward_checking,
+                                           ordering=ordering, backjumping=backjumping, seed=seed, restarts=restarts)
+
         try:
             self.stop_event.clear()
+            self.pause_event.clear()
+            self._search = None
             self.iteration_count = 0
             self.deadline = time.time() + time_limit_sec
 
             self.assignments.clear()
-            self.room_schedule.clear()
-            self.room_usage_count.clear()
-            self.slot_usage_count.clear()
+            self.slot_courses.clear()
+            self.nogoods.clear()
+            self.nogood_count = 0
+            self.nogood_learning = True
+            self._nogood_probe = (0, 0)
+            self._literals.clear()
+            self.partial = []
+            self.unscheduled = {}
 
             if not self.courses:
                 return False, "No Data"
 
-            feasible, msg = self.validate_feasibility()
+            # also builds the conflict graph
+            feasible, msg = self.validate_feasibility(reuse_conflicts)
             if not feasible:
                 return False, msg
 
+            problem = self.problem
+            self.course_by_code = problem.course_by_code
+            self.exam_students = problem.enrolled()  # enrollment classes, one agenda row each
+            self.exam_length = problem.lengths(self.slot_duration_minutes)
+            self.symmetry_breaking = symmetry_breaking
+            self.twins = self.find_twins() if symmetry_breaking else {}
+            self.room_symmetry = symmetry_breaking and all(n == 1 for n in self.exam_length.values())
+
+            self.ordering = ordering
+            self.forward_checking = forward_checking or ordering == "dynamic"
+            self.backjumping = backjumping
+            self.warm_start = warm_start or {}
+            self.two_phase = two_phase
+            self.room_cuts.clear()
+            self.rng = random.Random(seed)
+            self.restarts = restarts
+            self.restart_count = 0
+            self.fail_count.clear()
+            self.solver_stats = {"nodes": 0, "pruned": 0, "wipeouts": 0,
+                                 "backjumps": 0, "nogoods": 0, "nogood_hits": 0,
+                                 "student_classes": len(problem.class_courses),
+                                 "compression": round(problem.compression(), 2),
+                                 "twin_courses": len(self.twins), "room_classes": len(problem.room_groups())}
+
+            courses = [c for c in self.courses if c.code not in self.fixed]
+            self.rng.shuffle(courses)
+            courses.sort(key=lambda c: (len(c.students), len(self.conflict_matrix[c.code])), reverse=True)
+
+            self.room_workers = room_workers
+            return self._search_loop(courses, time.time())
+
+        except Exception as e:
+            return False, f"CRASH PREVENTED: {e}"
+
+    def _search_loop(self, courses, start, resume=False):
+        """
+        Backtracking runs of one solve (several with two_phase, one per room
+        round) and the final message. resume=True continues the paused run
+        first instead of starting a new one.
+        """
+        while True:
+            if resume:
+                resume = False
+                success = self._run_search()
+            else:
+                student_agenda = self.start_search(courses)
+                if student_agenda is None:
+                    if self.fixed:
+                        return False, "IMPOSSIBLE: the exams kept in place leave no start for some course"
+                    return False, "IMPOSSIBLE: some exams are longer than a day"
+                self.node_limit = self.run_node_limit()
+                success = self._backtrack(courses, student_agenda, start)
+            self.solver_stats["nodes"] = self.iteration_count
+            if success is None:
+                return False, "Paused"
+            if success is False and self.restart_due():
+                self.restart_count += 1
+                self.solver_stats["restarts"] = self.restart_count
+                courses = self.restart_order(courses)
+                continue
+            if not success and self.two_phase and self.room_cuts and not self.stop_event.is_set():
+                # no timetable avoids the cuts, but the cuts are not a proof
+                self.exact_rooms()
+                continue
+            if not success or not self.two_phase:
+                break
+
+            cuts, gave_up = self.assign_rooms(self.room_workers)
+            self.solver_stats["room_rounds"] = rounds = self.solver_stats.get("room_rounds", 0) + 1
+            if not cuts and not gave_up:
+                break
+            if time.time() > self.deadline:
+                return False, "Stopped: rooms could not be packed into the timetable"
+            if gave_up or rounds >= self.MAX_ROOM_ROUNDS:
+                self.warm_start = {code: (d, s) for code, (d, s, _) in self.assignments.items()}
+                self.exact_rooms()
+                continue
+            # re-plan from the current timetable without the combinations that did not pack
+            for cut in cuts:
+                literals = frozenset((code,) + self.assignments[code][:2] for code in cut)
+                for lit in literals:
+                    self.room_cuts[lit].append(literals)
+            self.solver_stats["room_cuts"] = self.solver_stats.get("room_cuts", 0) + len(cuts)
+            self.warm_start = {code: (d, s) for code, (d, s, _) in self.assignments.items()}
+
+        if success:
+            self.distribute_students()
+            return True, f"Found Solution ({round(time.time()-start,2)} s)"
+
+        partial = self.keep_partial()
+        if partial:
+            partial = "\n" + partial
+
+        if self.stop_event.is_set():
+            return False, "Stopped (timeout / user)" + partial
+
+        reasons = []
+
+        if self.total_slot_count() < len(self.courses):
+            reasons.append("Not enough time slots")
+
+        if any(len(c.students) > sum(r.capacity for r in self.classrooms) for c in self.courses):
+            reasons.append("Some courses exceed classroom capacity")
+
+        if not reasons:
+            reasons.append("Too many student conflicts. Not enough time slots to schedule exams.")
+
+        return False, "No Solution Found.\nReasons:\n- " + "\n- ".join(reasons) + partial
+
+    # ---- RESTARTS ----------------
+    def run_node_limit(self):
+        """Node limit of the next run: MAX_ITERATIONS, or the restart budget on top of the nodes so far."""
+        if not self.restarts:
+            return self.MAX_ITERATIONS
+        if self.restarts == "luby":
+            budget = self.RESTART_BASE * luby(self.restart_count + 1)
+        elif self.restarts == "geometric":
+            budget = int(self.RESTART_BASE * self.RESTART_GROWTH ** self.restart_count)
+        else:
+            raise ValueError(f"unknown restart policy: {self.restarts}")
+        return min(self.MAX_ITERATIONS, self.iteration_count + budget)
+
+    def restart_due(self):
+        """The last run failed only because it used up its own node budget."""
+        return (self.restarts is not None and not self.stop_event.is_set()
+                and self.node_limit < self.MAX_ITERATIONS and self.iteration_count > self.node_limit)
+
+    def restart_order(self, courses):
+        """Course order for the next run: courses with the most dead ends first, fresh random tie-breaks."""
+        courses = list(courses)
+        self.rng.shuffle(courses)
+        fails = self.fail_count
+        courses.sort(key=lambda c: (fails[c.code], len(c.students), len(self.conflict_matrix[c.code])), reverse=True)
+        return courses
+
+    def resume(self, time_limit_sec=25):
+        """Continue a backtracking search stopped by pause(), with a new time limit."""
+        if self._search is None:
+            return False, "Nothing to resume"
+        try:
+            self.stop_event.clear()
+            self.pause_event.clear()
+            self.deadline = time.time() + time_limit_sec
+            return self._search_loop(self._search.course_list, self._search.start_time, resume=True)
+        except Exception as e:
+            return False, f"CRASH PREVENTED: {e}"
+
+    # ---- SYMMETRY ----------------
+    def twin_groups(self):
+        """Cross-listed courses: groups of codes with the same students and exam length, in code order."""
+        problem = self.problem
+        lengths = problem.lengths(self.slot_duration_minutes)
+        groups = []
+        for group in problem.duplicate_courses():
+            by_length = defaultdict(list)
+            for i in group:
+                code = problem.course_codes[i]
+                by_length[lengths[code]].append(code)
+            groups.extend(sorted(codes) for codes in by_length.values() if len(codes) > 1)
+        return groups
+
+    def merged_followers(self, assignments):
+        """
+        {follower: lead} for the cross-listed groups that `assignments` holds
+        as one exam (solve_merged): same day, slot and rooms as the first
+        course of the group.
+        """
+        followers = {}
+        for group in self.twin_groups():
+            lead = assignments.get(group[0])
+            if lead is None:
+                continue
+            key = (lead[0], lead[1], [r.code for r in lead[2]])
+            for code in group[1:]:
+                entry = assignments.get(code)
+                if entry is not None and (entry[0], entry[1], [r.code for r in entry[2]]) == key:
+                    followers[code] = group[0]
+        return followers
+
+    def place_followers(self, followers):
+        """Give every follower its lead's exam (or its lead's place in unscheduled)."""
+        for code, lead in followers.items():
+            if lead in self.assignments:
+                self.assignments[code] = self.assignments[lead]
+            elif lead in self.unscheduled:
+                self.unscheduled[code] = self.unscheduled[lead]
+        self.distribute_students()
+
+    def find_twins(self):
+        """code -> (earlier twins, later twins); twins must start in this order."""
+        twins = {}
+        for group in self.twin_groups():
+            for k, code in enumerate(group):
+                twins[code] = (group[:k], group[k + 1:])
+        return twins
+
+    def twin_window(self, code):
+        """
+        Bitmask of the global starts left to `code` by its placed twins (it
+        must start after the earlier ones and before the later ones), and the
+        twins that narrowed it.
+        """
+        earlier, later = self.twins[code]
+        spd = self.slots_per_day
+        low, high, culprits = 0, self.num_days * spd, set()
+        for other in earlier:
+            placed = self.assignments.get(other)
+            if placed is not None:
+                low = max(low, placed[0] * spd + placed[1] + 1)
+                culprits.add(other)
+        for other in later:
+            placed = self.assignments.get(other)
+            if placed is not None:
+                high = min(high, placed[0] * spd + placed[1])
+                culprits.add(other)
+        if high <= low:
+            return 0, culprits
+        return ((1 << high) - 1) & ~((1 << low) - 1), culprits
+
+    def start_search(self, courses):
+        """Fresh search state for one backtracking run; None if some course has no start at all."""
+        self.assignments.clear()
+        self.slot_courses.clear()
+        self.init_candidates(courses)
+        self.init_rooms()
+        seats = self.seat_capacity if self.seat_capacity is not None else sum(r.capacity for r in self.classrooms)
+        self.free_seats = [seats] * len(self.slot_usage)
+        if self.forward_checking:
+            self.init_domains(courses)
+            if not all(self.domains.values()):
+                return None
+        if self.ordering == "dynamic":
+            self.init_ordering(courses)
+        num_rows = len(self.problem.class_courses)
+        self.free_capacity = None
+        if self.use_vectors(courses):
+            self.free_capacity = np.full(len(self.slot_usage), sum(self.room_capacities), dtype=np.int64)
+            student_agenda = ArrayAgenda(self.num_days, num_rows, self.student_rules())
+        else:
+            student_agenda = StudentAgenda(self.num_days, range(num_rows), self.student_rules())
+        if self.fixed and not self.place_fixed(student_agenda):
+            return None
+        return student_agenda
+
+    def place_fixed(self, student_agenda):
+        """
+        Put the exams of self.fixed in place before the search (repair mode);
+        False if they leave some searched course without a start.
+        """
+        rooms_by_code = {r.code: r for r in self.classrooms}
+        for code, (d, s, rooms) in self.fixed.items():
+            rooms = [rooms_by_code[r.code] for r in rooms]
+            self.place_exam(self.course_by_code[code], d, s, rooms, self.exam_length[code], student_agenda)
+        for code, (d, _, _) in self.fixed.items():
+            course = self.course_by_code[code]
+            if self.forward_checking and not self.forward_check(course, d, student_agenda)[1]:
+                return False
+            if self.ordering == "dynamic":
+                self.update_saturation(course, d, +1)
+        return True
+
+    def use_vectors(self, courses):
+        """NumPy path for this search: only without forward checking (its per-student updates stay scalar)."""
+        if not HAS_NUMPY or self.forward_checking or self.vectorize is False:
+            return False
+        if self.vectorize:
+            return True
+        return any(len(self.exam_students[c.code]) >= self.VECTORIZE_MIN_STUDENTS for c in courses)
+
+    def room_start_mask(self, need, slots_needed):
+        """Global starts where the free rooms of every slot the exam covers have `need` seats (NumPy path)."""
+        capacity = self.free_capacity
+        last = len(capacity) - slots_needed + 1
+        if last <= 0:
+            return 0
+        lowest = capacity[:last]
+        for k in range(1, slots_needed):
+            lowest = np.minimum(lowest, capacity[k:k + last])
+        return bits_to_int((lowest >= need).astype(np.int64), 1)
+
+    def assign_rooms(self, workers=1):
+        """
+        Phase two of the two-phase solve: pack rooms into the timetable in
+        assignments. Returns (cuts, gave_up): for every cluster no packing was
+        found for, the codes of a minimal subset without one ([] when every
+        exam got rooms); gave_up is True when the packer hit its node limit
+        on some cluster, which says nothing about that cluster.
+        """
+        capacities = self.room_capacities
+        exams = []
+        for code, (d, s, _) in self.assignments.items():
+            course = self.course_by_code[code]
+            exams.append((code, d, s, self.exam_length[code], len(course.students)))
+        clusters = room_packing.time_clusters(exams)
+        if workers > 1 and len(clusters) > 1:
+            import parallel
+            packed = parallel.pack_clusters(capacities, clusters, workers)
+        else:
+            packed = [room_packing.pack_cluster(capacities, cluster) for cluster in clusters]
+
+        cuts, gave_up = [], False
+        for cluster, rooms in zip(clusters, packed):
+            if rooms == room_packing.GAVE_UP:
+                gave_up = True
+                continue
+            if rooms is None:
+                cuts.append([e[0] for e in room_packing.minimal_conflict(capacities, cluster)])
+                continue
+            for code, idx in rooms.items():
+                d, s, _ = self.assignments[code]
+                self.assignments[code] = (d, s, [self.rooms_by_capacity[i] for i in idx])
+        return cuts, gave_up
+
+    def exact_rooms(self):
+        """
+        Leave the two-phase solve for the one-phase search, which picks rooms
+        exam by exam: used when room packing gave up, ran out of rounds, or
+        the timetable search failed under room cuts (the packer is a
+        heuristic, so its cuts prove nothing). Cuts and nogoods are dropped
+        and the last timetable is tried first. The partial schedule of the
+        timetable search has no rooms, so the one-phase search keeps its own.
+        """
+        self.two_phase = False
+        self.partial = []
+        self.room_cuts.clear()
+        self.nogoods.clear()
+        self.nogood_count = 0
+        self.solver_stats["room_fallback"] = True
+
+    def violated_room_cut(self, code, d, s):
+        """Called right after `code` was placed at (d, s): the other exams of a fully placed room cut, or None."""
+        for literals in self.room_cuts.get((code, d, s), ()):
+            for lit in literals:
+                placed = self.assignments.get(lit[0])
+                if placed is None or placed[0] != lit[1] or placed[1] != lit[2]:
+                    break
+            else:
+                return {lit[0] for lit in literals if lit[0] != code}
+        return None
+
+    def find_minimum_slots(self, slots_per_day=None, time_limit_sec=5, max_total_slots=500,
+                           progress_callback=None, **solver_options):
+        """
+        Smallest total number of slots for which a schedule is found.
+        Starts at the preflight lower bound, gallops upwards (+spd, +2*spd,
+        +4*spd, ...) until a probe succeeds, then binary-searches the gap.
+        Every probe reuses the conflict graph and starts from the last feasible
+        schedule. A probe that times out counts as infeasible.
+        progress_callback(total_slots, success, msg) is called after each probe.
+        Returns (success, msg, total_slots, days); on success the best
+        schedule is loaded in assignments.
+        """
+        # calendar settings to restore when no schedule is found
+        saved = (self.slots_per_day, self.num_days, self.total_slots)
+        found = False
+        probes = []
+        try:
+            if slots_per_day:
+                self.slots_per_day = slots_per_day
+            spd = self.slots_per_day
+            solver_options = solver_options or {"ordering": "dynamic", "backjumping": True}
+
+            if not self.courses:
+                return False, "No Data", 0, 0
+
+            # lower bound from the preflight (days -> slots: the last day may be partial)
+            self.total_slots = None
+            self.num_days = max(1, -(-max_total_slots // spd))
             self.build_conflict_matrix()
+            problems = self.preflight(reuse_conflicts=True)
+            if problems:
+                return False, "IMPOSSIBLE (preflight):\n- " + "\n- ".join(problems), 0, 0
+            bounds = self.lower_bounds()
+            min_days = max(1, bounds["clique"][0], bounds["student"][0])
+            low = max((min_days - 1) * spd + 1, 1)
+
+            best = None  # (total, assignments, student_room_map, days)
+
+            def probe(total):
+                self.total_slots = total
+                self.num_days = -(-total // spd)
+                if total % spd == 0:
+                    self.total_slots = None
+                warm = {code: (d, s) for code, (d, s, _) in best[1].items()} if best else None
+                success, msg = self.solve(time_limit_sec=time_limit_sec, warm_start=warm,
+                                          reuse_conflicts=True, **solver_options)
+                probes.append((total, success))
+                if progress_callback:
+                    progress_callback(total, success, msg)
+                return success
+
+            # gallop
+            total, step, last_fail = low, spd, low - 1
+            while total <= max_total_slots:
+                if probe(total):
+                    best = (total, dict(self.assignments), dict(self.student_room_map), self.num_days)
+                    break
+                last_fail = total
+                total += step
+                step *= 2
+            if best is None:
+                # one last try at the cap before giving up
+                if last_fail < max_total_slots and probe(max_total_slots):
+                    best = (max_total_slots, dict(self.assignments), dict(self.student_room_map), self.num_days)
+                else:
+                    return False, f"Could not find feasible schedule within {max_total_slots} slots", 0, 0
+
+            # binary search in (last_fail, best]
+            lo, hi = last_fail, best[0]
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if probe(mid):
+                    hi = mid
+                    best = (mid, dict(self.assignments), dict(self.student_room_map), self.num_days)
+                else:
+                    lo = mid
 
-            random.shuffle(self.courses)
-            courses = sorted(
-                self.courses,
-                key=lambda c: (len(c.students), len(self.conflict_matrix[c.code])),
-                reverse=True
-            )
+            total, assignments, room_map, days = best
+            self.num_days = days
+            self.total_slots = total if total % spd else None
+            self.assignments.clear()
+            self.assignments.update(assignments)
+            self.student_room_map.clear()
+            self.student_room_map.update(room_map)
+            self.solver_stats = {"probes": probes, "lower_bound": low}
+            last_day = total - (days - 1) * spd
+            msg = f"Minimum slots: {total} ({days} days × {spd} slots/day"
+            msg += f", last day uses {last_day} slots)" if last_day != spd else ")"
+            found = True
+            return True, msg, total, days
+        finally:
+            if not found:
+                self.slots_per_day, self.num_days, self.total_slots = saved
+            if not found and probes:
+                # a failed probe's (partial) schedule belongs to another calendar
+                self.assignments.clear()
+                self.student_room_map.clear()
+                self.partial = []
+                self.unscheduled = {}
+
+    def solve_portfolio(self, time_limit_sec=25, workers=None, seed=None):
+        """
+        Run several seeded searches with different heuristics in parallel worker
+        processes (one per core by default). The first feasible schedule wins;
+        the other workers are cancelled through their stop events, and stop()
+        on this object cancels the whole portfolio.
+        """
+        import parallel
+
+        try:
+            self.stop_event.clear()
+            self.assignments.clear()
+            self.student_room_map.clear()
+            self.partial = []
+            self.unscheduled = {}
+
+            if not self.courses:
+                return False, "No Data"
+
+            feasible, msg = self.validate_feasibility()
+            if not feasible:
+                return False, msg
 
-            student_agenda = defaultdict(lambda: defaultdict(list))
             start = time.time()
+            success, msg, assignments, info = parallel.run_portfolio(self, time_limit_sec, workers, seed)
+            self.solver_stats = info
+            if not success:
+                return False, msg
 
-            success = self._backtrack(courses, 0, student_agenda, start)
+            self.apply_assignments(assignments)
+            return True, f"Found Solution ({round(time.time() - start, 2)} s, worker {info['winner']} of {info['workers']})"
+        except Exception as e:
+            return False, f"CRASH PREVENTED: {e}"
 
-            if success:
-                self.distribute_students()
-                return True, f"Found Solution ({round(time.time()-start,2)} s)"
+    def connected_components(self):
+        """Course codes per connected component of the conflict graph, largest first."""
+        graph = self.conflict_matrix
+        seen, components = set(), []
+        for code in self.problem.course_codes:
+            if code in seen:
+                continue
+            seen.add(code)
+            component, stack = [code], [code]
+            while stack:
+                for other in graph[stack.pop()]:
+                    if other not in seen:
+                        seen.add(other)
+                        component.append(other)
+                        stack.append(other)
+            components.append(component)
+        components.sort(key=len, reverse=True)
+        return components
+
+    def solve_components(self, time_limit_sec=25, workers=None, **options):
+        """
+        Courses in different connected components of the conflict graph share
+        no students, so each component is timetabled on its own (in worker
+        processes) and a failure in one never backtracks through another.
+        Rooms are the only shared resource: every group gets a share of the
+        seats of each slot in proportion to its enrollments, and one final
+        two-phase pass, warm-started from the merged timetable, packs the rooms
+        and repairs whatever the split did not cover.
+        """
+        import parallel
 
-            if self.stop_event.is_set():
+        try:
+            self.stop_event.clear()
+            self.assignments.clear()
+            self.student_room_map.clear()
+            self.partial = []
+            self.unscheduled = {}
+
+            if not self.courses:
+                return False, "No Data"
+
+            feasible, msg = self.validate_feasibility()
+            if not feasible:
+                return False, msg
+
+            start = time.time()
+            components = self.connected_components()
+            # single courses share nothing with anything, so they can go together
+            groups = [comp for comp in components if len(comp) > 1]
+            singles = [comp[0] for comp in components if len(comp) == 1]
+            if singles:
+                groups.append(singles)
+
+            problem = self.problem
+            size = {code: problem.size[problem.course_index[code]] for code in problem.course_codes}
+            total_seats = sum(r.capacity for r in self.classrooms)
+            total_enrolled = sum(size.values()) or 1
+            seat_capacities = [max(max(size[code] for code in group),
+                                   total_seats * sum(size[code] for code in group) // total_enrolled)
+                               for group in groups]
+
+            jobs = [(group, {"seat_capacity": seats}) for group, seats in zip(groups, seat_capacities)]
+            results = parallel.run_subproblems(self, jobs, dict(options, two_phase=True), time_limit_sec, workers)
+            self.solver_stats = {"components": len(components), "groups": len(groups)}
+            for result in results:
+                if result is not None and not result[0]:
+                    return False, result[1]
+            if None in results:
                 return False, "Stopped (timeout / user)"
+            timetable = {code: (d, s) for _, _, assignments in results for code, (d, s, _) in assignments.items()}
+
+            remaining = max(start + time_limit_sec - time.time(), 1)
+            stats = self.solver_stats
+            success, msg = self.solve(time_limit_sec=remaining, warm_start=timetable, reuse_conflicts=True,
+                                      two_phase=True, **options)
+            stats.update(self.solver_stats)
+            self.solver_stats = stats
+            if not success:
+                return False, msg
+            return True, f"Found Solution ({round(time.time() - start, 2)} s, {len(components)} components)"
+        except Exception as e:
+            return False, f"CRASH PREVENTED: {e}"
+
+    def assign_days(self, codes, day_of, tabu=()):
+        """
+        Day phase of the hierarchical solve: put every course in `codes` on a
+        day, next to the courses already in day_of (code -> day). A day is a
+        bin:
+          - a student takes at most max_exams_per_day exams, and they must fit
+            into the day with the gap between them (and at most
+            max_exams_per_48h on the day and a neighbouring day)
+          - conflicting exams on one day must get separated starts: with room
+            for only two separated exams the day's conflict graph has to be
+            bipartite, otherwise any clique must fit one after another
+          - exam seat-slots stay within the seats of the day
+        Most conflicted course first; among the days that pass, the one with
+        the fewest conflicting exams (then the lightest) wins. A course with
+        no such day takes the day with the fewest conflicting exams and sends
+        those back to the queue (bounded number of evictions). (code, day)
+        pairs in tabu are avoided while the course has any other day.
+        Returns the codes that found no day.
+        """
+        problem = self.problem
+        graph = self.conflict_matrix
+        length = problem.lengths(self.slot_duration_minutes)
+        index = problem.course_index
+        rules = self.student_rules()
+        gap = rules.min_gap
+        seats = sum(r.capacity for r in self.classrooms)
+        tabu = set(tabu)
+
+        student_day = defaultdict(list)
+        load = [0] * self.num_days
+        members = [set() for _ in range(self.num_days)]
+
+        def place(code, d):
+            i = index[code]
+            day_of[code] = d
+            members[d].add(code)
+            for k in problem.classes_of(i):
+                student_day[(k, d)].append(length[code])
+            load[d] += problem.size[i] * length[code]
+
+        def unplace(code):
+            i = index[code]
+            d = day_of.pop(code)
+            members[d].discard(code)
+            for k in problem.classes_of(i):
+                student_day[(k, d)].remove(length[code])
+            load[d] -= problem.size[i] * length[code]
+
+        for code, d in list(day_of.items()):
+            del day_of[code]
+            place(code, d)
+
+        def fits(lengths, d):
+            return sum(lengths) + gap * (len(lengths) - 1) <= self.day_slots(d)
+
+        def bipartite_with(code, d):
+            colour = {code: 0}
+            stack = [code]
+            while stack:
+                a = stack.pop()
+                for b in graph[a]:
+                    if b not in members[d] and b != code:
+                        continue
+                    if b not in colour:
+                        colour[b] = 1 - colour[a]
+                        stack.append(b)
+                    elif colour[b] == colour[a]:
+                        return False
+            return True
+
+        def day_ok(code, d):
+            i = index[code]
+            n = length[code]
+            if load[d] + problem.size[i] * n > seats * self.day_slots(d):
+                return False
+            for k in problem.classes_of(i):
+                taken = student_day.get((k, d))
+                if taken and (len(taken) >= rules.max_per_day or not fits(taken + [n], d)):
+                    return False
+                if rules.max_per_48h is not None:
+                    counts = [len(student_day.get((k, e), ())) for e in (d - 1, d, d + 1)]
+                    if rules.window_full(counts, 1):
+                        return False
+            same_day = [o for o in graph[code] if o in members[d]]
+            if not same_day:
+                return True
+            separated = (self.day_slots(d) + gap) // (1 + gap)  # most unit exams with gaps in a day
+            if separated <= 2:
+                return separated == 2 and fits([n] + [length[o] for o in same_day[:1]], d) and bipartite_with(code, d)
+            clique = [code]
+            for o in sorted(same_day, key=lambda o: len(graph[o]), reverse=True):
+                if all(o in graph[c] for c in clique[1:]):
+                    clique.append(o)
+            return fits([length[c] for c in clique], d)
+
+        def clashes(code, d):
+            return sum(1 for o in graph[code] if o in members[d])
+
+        queue = sorted(codes, key=lambda c: (len(graph[c]), problem.size[index[c]]), reverse=True)
+        evictions, max_evictions = 0, 20 * len(queue) + 100
+        unplaced = []
+        while queue:
+            code = queue.pop(0)
+            options = [d for d in range(self.num_days) if day_ok(code, d)]
+            allowed = [d for d in options if (code, d) not in tabu] or options
+            if allowed:
+                place(code, min(allowed, key=lambda d: (clashes(code, d), load[d])))
+                continue
+            if evictions >= max_evictions:
+                unplaced.append(code)
+                continue
+            days = [d for d in range(self.num_days) if (code, d) not in tabu] or range(self.num_days)
+            d = min(days, key=lambda d: (clashes(code, d), load[d]))
+            for o in [o for o in graph[code] if o in members[d]]:
+                unplace(o)
+                tabu.add((o, d))
+                queue.append(o)
+                evictions += 1
+            if day_ok(code, d):
+                place(code, d)
+            else:
+                unplaced.append(code)
+        self.solver_stats["day_evictions"] = self.solver_stats.get("day_evictions", 0) + evictions
+        return unplaced
+
+    def solve_hierarchical(self, time_limit_sec=25, workers=None, day_time_limit_sec=5, **options):
+        """
+        Two levels for long exam periods: assign_days puts every course on a
+        day, then every day is solved as its own small problem (one day,
+        slots and rooms) in worker processes. The courses of a day that
+        cannot be solved go back to the day phase (avoiding that day) and
+        only the days that changed are solved again.
+        """
+        import parallel
+
+        try:
+            self.stop_event.clear()
+            self.assignments.clear()
+            self.student_room_map.clear()
+            self.partial = []
+            self.unscheduled = {}
+
+            if not self.courses:
+                return False, "No Data"
+
+            feasible, msg = self.validate_feasibility()
+            if not feasible:
+                return False, msg
+
+            start = time.time()
+            deadline = start + time_limit_sec
+            day_of, tabu = {}, set()
+            self.solver_stats = {}
+            unplaced = self.assign_days(self.problem.course_codes, day_of)
+            pending = set(day_of.values())
+            solved = {}
+            rounds = 0
+            while not unplaced:
+                if not pending:
+                    break
+                days = sorted(pending)
+                jobs = [([c for c, d in day_of.items() if d == day],
+                         {"num_days": 1, "slots_per_day": self.day_slots(day), "total_slots": None})
+                        for day in days]
+                limit = min(day_time_limit_sec, max(deadline - time.time(), 0.1))
+                results = parallel.run_subproblems(self, jobs, options, limit, workers, stop_on_failure=False)
+                rounds += 1
+                failed = []
+                for day, result in zip(days, results):
+                    if result is not None and result[0]:
+                        solved[day] = result[2]
+                    else:
+                        failed.append(day)
+                if not failed:
+                    pending = set()
+                    break
+                if self.stop_event.is_set() or time.time() > deadline:
+                    self.solver_stats["day_rounds"] = rounds
+                    return False, "Stopped (timeout / user)"
+
+                released = [c for c, d in day_of.items() if d in failed]
+                for code in released:
+                    tabu.add((code, day_of.pop(code)))
+                unplaced = self.assign_days(released, day_of, tabu)
+                pending = set(failed) | {day_of[c] for c in released if c in day_of}
+                for day in pending:
+                    solved.pop(day, None)
+
+            self.solver_stats.update({"day_rounds": rounds, "days_used": len(solved)})
+            if unplaced:
+                return False, ("Stopped: the day phase found no day for "
+                               + self._fmt_list(unplaced, limit=6) + " (try more days or another solver)")
+
+            assignments = {}
+            for day, day_assignments in solved.items():
+                for code, (_, s, room_codes) in day_assignments.items():
+                    assignments[code] = (day, s, room_codes)
+            self.apply_assignments(assignments)
+            return True, f"Found Solution ({round(time.time() - start, 2)} s, {len(solved)} days solved separately)"
+        except Exception as e:
+            return False, f"CRASH PREVENTED: {e}"
+
+    def solve_merged(self, time_limit_sec=25, **options):
+        """
+        Solve with every group of cross-listed courses merged into one exam:
+        only the first course of a group is scheduled and the others share
+        its slot and rooms (they have the same students).
+        """
+        followers = {}
+        for group in self.twin_groups():
+            for code in group[1:]:
+                followers[code] = group[0]
+        if not followers:
+            return self.solve(time_limit_sec, **options)
+
+        with self.leads_only(followers):
+            success, msg = self.solve(time_limit_sec, **options)
+        if success or self.unscheduled:
+            # a partial schedule too: followers go with their lead course
+            self.place_followers(followers)
+        if success:
+            msg += f", {len(followers)} cross-listed courses merged"
+        self.solver_stats["merged_courses"] = len(followers)
+        return success, msg
+
+    def check_assignments(self, assignments):
+        """
+        Check a schedule against the current data. Exams are taken largest
+        first; an exam is broken when its course or a room no longer exists,
+        it runs past the end of its day, its rooms are too small or already
+        taken, or it breaks a student rule next to the exams kept so far.
+        Returns (kept {code: (day, slot, [Classroom])}, broken codes), where
+        broken also holds the courses that have no exam yet.
+        """
+        problem = self.problem
+        lengths = problem.lengths(self.slot_duration_minutes)
+        rooms_by_code = {r.code: r for r in self.classrooms}
+        agenda = StudentAgenda(self.num_days, (), self.student_rules())
+        taken = set()  # (day, slot, room code)
+        kept, broken = {}, []
+        for c in sorted(self.courses, key=lambda c: -len(c.students)):
+            entry = assignments.get(c.code)
+            if entry is None:
+                broken.append(c.code)
+                continue
+            d, s, rooms = entry
+            n = lengths[c.code]
+            rooms = [rooms_by_code.get(r.code) for r in rooms]
+            slots = [(d, s + k, r.code) for k in range(n) for r in rooms if r is not None]
+            classes = problem.classes_of(problem.course_index[c.code])
+            if (d >= self.num_days or s + n > self.day_slots(d) or None in rooms
+                    or sum(r.capacity for r in rooms) < len(c.students)
+                    or any(slot in taken for slot in slots) or not agenda.fits(classes, d, s, n)):
+                broken.append(c.code)
+                continue
+            agenda.add(classes, d, s, n)
+            taken.update(slots)
+            kept[c.code] = (d, s, rooms)
+        return kept, broken
 
-            reasons = []
+    def solve_repair(self, time_limit_sec=25, previous=None, **options):
+        """
+        Minimal-perturbation re-solve after a data change (late enrollments,
+        a smaller room, ...). The exams of `previous` (default: the current
+        assignments) that are still valid stay where they are; only the
+        broken ones (check_assignments) are searched again, each tried at its
+        old start first; cross-listed courses held as one exam stay together
+        (merged_followers). When that fails, the kept exams blocking the courses
+        the search could not place are freed too (all conflict neighbours of
+        the searched courses when none are known), round by round, until the
+        search succeeds (nothing left to free: every course is searched).
+        """
+        try:
+            start = time.time()
+            previous = dict(self.assignments if previous is None else previous)
+            if not self.courses:
+                return False, "No Data"
+            followers = self.merged_followers(previous)
+            if followers:
+                # cross-listed courses merged into one exam are repaired as one
+                with self.leads_only(followers):
+                    success, msg = self.solve_repair(time_limit_sec, {code: v for code, v in previous.items()
+                                                                      if code not in followers}, **options)
+                if success or self.unscheduled:
+                    self.place_followers(followers)
+                self.solver_stats["merged_courses"] = len(followers)
+                if success:
+                    moved = sum(1 for code in followers if self.assignments[code][:2] != previous[code][:2])
+                    self.solver_stats["moved"] = self.solver_stats.get("moved", 0) + moved
+                    msg += f", {len(followers)} merged cross-listed courses kept with their lead ({moved} moved)"
+                return success, msg
+            self.build_conflict_matrix()
+            kept, broken = self.check_assignments(previous)
+            self.solver_stats = {"repair_broken": 0}
+            if not broken:
+                self.partial = []
+                self.unscheduled = {}
+                self.assignments = dict(kept)
+                self.distribute_students()
+                return True, "Schedule still valid: nothing to repair"
+
+            graph = self.conflict_matrix
+            free = set(broken)
+            hints = {code: previous[code][:2] for code in previous}
+            rounds = 0
+            while True:
+                rounds += 1
+                remaining = time_limit_sec - (time.time() - start)
+                last = len(free) == len(self.courses)
+                self.fixed = {code: v for code, v in kept.items() if code not in free}
+                self.wiped_course = None
+                try:
+                    # twins cannot be ordered freely around exams that stay put
+                    success, msg = self.solve(remaining if last else remaining / 2, warm_start=hints,
+                                              reuse_conflicts=True, symmetry_breaking=False, **options)
+                finally:
+                    self.fixed = {}
+                # a round that ran out of time sets stop_event too; only a stop() before its deadline ends the repair
+                stopped = self.stop_event.is_set() and time.time() < self.deadline
+                if success or last or stopped or time.time() - start >= time_limit_sec:
+                    break
+                # free the kept exams blocking the courses the deepest partial left out
+                # (keep_partial), or the course the kept exams wiped out
+                blocking = {o for others in self.unscheduled.values() for o in others}
+                if not self.unscheduled and self.wiped_course is not None:
+                    blocking = graph[self.wiped_course]
+                ring = {o for o in blocking if o in kept} - free
+                if not ring:
+                    ring = {o for code in free for o in graph[code] if o in kept} - free
+                free |= ring or set(kept)
+
+            moved = sum(1 for code, (d, s, _) in self.assignments.items()
+                        if code in previous and previous[code][:2] != (d, s))
+            rooms_changed = sum(1 for code, (d, s, rooms) in self.assignments.items()
+                                if code in previous and previous[code][:2] == (d, s)
+                                and [r.code for r in rooms] != [r.code for r in previous[code][2]])
+            self.solver_stats.update({"repair_broken": len(broken), "repair_rounds": rounds,
+                                      "repair_freed": len(free), "moved": moved, "rooms_changed": rooms_changed})
+            if not success:
+                return False, msg
+            return True, (f"Repaired ({round(time.time() - start, 2)} s): {len(broken)} broken, "
+                          f"{moved} exams moved, {rooms_changed} changed rooms only")
+        except Exception as e:
+            return False, f"CRASH PREVENTED: {e}"
 
-            if self.num_days * self.slots_per_day < len(self.courses):
-                reasons.append("Not enough time slots")
+    def solve_local_search(self, time_limit_sec=25, seed=None):
+        """
+        Simulated annealing over complete schedules (local_search.LocalSearch).
+        Scales to instances where exhaustive backtracking does not, but cannot
+        prove that no schedule exists.
+        """
+        from local_search import LocalSearch
 
-            if any(len(c.students) > sum(r.capacity for r in self.classrooms) for c in self.courses):
-                reasons.append("Some courses exceed classroom capacity")
+        try:
+            self.stop_event.clear()
+            self.assignments.clear()
+            self.student_room_map.clear()
+            self.partial = []
+            self.unscheduled = {}
 
-            if not reasons:
-                reasons.append("Too many student conflicts. Not enough time slots to schedule exams.")
+            if not self.courses:
+                return False, "No Data"
 
-            return False, "No Solution Found.\nReasons:\n- " + "\n- ".join(reasons)
+            feasible, msg = self.validate_feasibility()
+            if not feasible:
+                return False, msg
 
+            start = time.time()
+            engine = LocalSearch(self, seed)
+            success = engine.run(start + time_limit_sec, self.stop_event, self.progress_callback)
+            self.iteration_count = engine.iterations
+            self.solver_stats = {"iterations": engine.iterations, "violations": engine.violations()}
+            if not success:
+                if self.stop_event.is_set():
+                    return False, "Stopped (timeout / user)"
+                return False, f"Stopped (timeout / user): local search left {engine.violations()} violations"
+
+            self.assignments.update(engine.export())
+            self.distribute_students()
+            return True, f"Found Solution ({round(time.time() - start, 2)} s, local search)"
+        except Exception as e:
+            return False, f"CRASH PREVENTED: {e}"
 
+    def optimize(self, time_limit_sec=10, seed=None):
+        """
+        Anytime improvement of the current (feasible) schedule: simulated
+        annealing on student spread, room utilization and late-day exams
+        (optimizer.ScheduleOptimizer) until the time limit or stop(); the
+        best schedule seen replaces self.assignments either way.
+        """
+        from optimizer import ScheduleOptimizer
+        try:
+            self.stop_event.clear()
+            self.solver_stats = {}
+            start = time.time()
+            # cross-listed courses merged into one exam (solve_merged) move with their lead
+            followers = self.merged_followers(self.assignments)
+            with self.leads_only(followers):
+                engine = ScheduleOptimizer(self, seed)
+                loaded = engine.load(self.assignments)
+                if loaded:
+                    first = engine.best_score
+                    engine.run(start + time_limit_sec, self.stop_event, self.progress_callback, self.score_callback)
+            if not loaded:
+                return False, "Nothing to optimize: the current schedule is incomplete or infeasible"
+            self.partial = []
+            self.unscheduled = {}
+            self.assignments.clear()
+            self.assignments.update(engine.export())
+            self.place_followers(followers)
+            self.solver_stats = {"optimize_iterations": engine.iterations, "merged_courses": len(followers),
+                                 "score_start": round(first, 2), "score": round(engine.best_score, 2)}
+            stopped = " (stopped)" if self.stop_event.is_set() else ""
+            return True, (f"score {round(first, 2)} -> {round(engine.best_score, 2)} "
+                          f"in {round(time.time() - start, 2)} s{stopped}")
         except Exception as e:
             return False, f"CRASH PREVENTED: {e}"
 
+    def apply_assignments(self, assignments):
+        """Load {code: (day, slot, [room codes])} produced elsewhere (e.g. a worker process)."""
+        rooms_by_code = {r.code: r for r in self.classrooms}
+        self.assignments.clear()
+        for code, (d, s, room_codes) in assignments.items():
+            self.assignments[code] = (d, s, [rooms_by_code[rc] for rc in room_codes])
+        self.distribute_students()
+
     def save_data_to_db(self, slot: int = 1):
         # classrooms
         cls = [(r.code, r.capacity) for r in self.classrooms]
@@ -508,7 +2030,256 @@ class ScheduleSystem:
 
         return summary, "\n".join(msg_lines)
 
-    def _backtrack(self, course_list, index, student_agenda, start_time):
+    # ---- PLACEMENT ----------------
+    def place_exam(self, course, d, s, rooms, slots_needed, student_agenda):
+        self.assignments[course.code] = (d, s, rooms)
+
+        # Mark all slots occupied by this multi-slot exam
+        g = d * self.slots_per_day + s
+        for slot_offset in range(slots_needed):
+            self._bump_usage(g + slot_offset, +1)
+            self.slot_courses[(d, s + slot_offset)].add(course.code)
+
+        taken = 0
+        for r in rooms:
+            taken |= self._room_bit[r.code]
+        for slot_offset in range(slots_needed):
+            self.free_rooms[g + slot_offset] &= ~taken
+            self.free_seats[g + slot_offset] -= len(course.students)
+        if self.free_capacity is not None:
+            self.free_capacity[g:g + slots_needed] -= sum(r.capacity for r in rooms)
+
+        student_agenda.add(self.exam_students[course.code], d, s, slots_needed)
+
+    def remove_exam(self, course, d, s, rooms, slots_needed, student_agenda):
+        del self.assignments[course.code]
+        g = d * self.slots_per_day + s
+        for slot_offset in range(slots_needed):
+            self._bump_usage(g + slot_offset, -1)
+            self.slot_courses[(d, s + slot_offset)].discard(course.code)
+        taken = 0
+        for r in rooms:
+            taken |= self._room_bit[r.code]
+        for slot_offset in range(slots_needed):
+            self.free_rooms[g + slot_offset] |= taken
+            self.free_seats[g + slot_offset] += len(course.students)
+        if self.free_capacity is not None:
+            self.free_capacity[g:g + slots_needed] += sum(r.capacity for r in rooms)
+        student_agenda.remove(self.exam_students[course.code], d, s, slots_needed)
+
+    # ---- BACKJUMPING / NOGOODS ----------------
+    def _literal(self, code):
+        """Literal of a placed exam, built once per placement."""
+        entry = self.assignments[code]
+        cached = self._literals.get(code)
+        if cached is not None and cached[0] is entry:
+            return cached[1]
+        d, s, rooms = entry
+        if self.room_symmetry:
+            # rooms of one capacity are interchangeable slot by slot
+            literal = (code, d, s, tuple(r.capacity for r in rooms))
+        else:
+            literal = (code, d, s, tuple(r.code for r in rooms))
+        self._literals[code] = (entry, literal)
+        return literal
+
+    def _day_culprits(self, course, day):
+        """
+        Assigned neighbours that can block a start on `day`: the ones on that
+        day, and with max_exams_per_48h also the ones on the days next to it.
+        """
+        if self.max_exams_per_48h:
+            days = (day - 1, day, day + 1)
+            return {c for c in self.conflict_matrix[course.code]
+                    if c in self.assignments and self.assignments[c][0] in days}
+        return {c for c in self.conflict_matrix[course.code]
+                if c in self.assignments and self.assignments[c][0] == day}
+
+    def _room_culprits(self, d, s, slots_needed):
+        culprits = set()
+        for slot_offset in range(slots_needed):
+            culprits |= self.slot_courses[(d, s + slot_offset)]
+        return culprits
+
+    def learn_nogood(self, course, conflict_set):
+        """
+        Remember that the current assignments of `conflict_set` leave no place
+        for `course`. Small nogoods only. The nogood is watched on its most
+        recently placed exam, the one the search changes next; see
+        violated_nogood.
+        """
+        if not self.nogood_learning or not conflict_set or len(conflict_set) > self.NOGOOD_MAX_SIZE:
+            return
+        stats = self.solver_stats
+        learned, hits = self._nogood_probe
+        if stats["nogoods"] - learned >= self.NOGOOD_PROBE:
+            if stats["nogood_hits"] - hits < self.NOGOOD_MIN_HITS * self.NOGOOD_PROBE:
+                # the nogoods hardly ever fire: checking them costs more than they prune
+                self.nogood_learning = False
+                self.nogoods.clear()
+                self.nogood_count = 0
+                stats["nogoods_off"] = True
+                return
+            self._nogood_probe = (stats["nogoods"], stats["nogood_hits"])
+        if self.nogood_count >= self.NOGOOD_LIMIT and not self.drop_nogoods():
+            return
+        watch = next(code for code in reversed(self.assignments) if code in conflict_set)
+        literals = tuple(self._literal(c) for c in conflict_set)
+        self.nogoods[self._literal(watch)].append([literals, course.code, 0])
+        self.nogood_count += 1
+        stats["nogoods"] += 1
+
+    def drop_nogoods(self):
+        """
+        Make room in a full nogood store: forget the nogoods that never fired
+        and halve the hit counts of the others. False if nothing was dropped.
+        """
+        count = 0
+        for lit, watched in list(self.nogoods.items()):
+            kept = [nogood for nogood in watched if nogood[2]]
+            for nogood in kept:
+                nogood[2] //= 2
+            if kept:
+                self.nogoods[lit] = kept
+            else:
+                del self.nogoods[lit]
+            count += len(kept)
+        dropped = self.nogood_count - count
+        self.nogood_count = count
+        self.solver_stats["nogoods_dropped"] = self.solver_stats.get("nogoods_dropped", 0) + dropped
+        return dropped > 0
+
+    def violated_nogood(self, code):
+        """
+        Called right after `code` was placed. Returns the culprits of a learned
+        nogood that is now fully assigned and whose target is still unassigned.
+        Only the nogoods watching the new literal are looked at: each one
+        moves its watch to another literal that does not hold, and the ones
+        that find none are fully assigned. Literals are only taken back
+        between checks, so a watched literal never holds when it is not
+        being checked.
+        """
+        lit = self._literal(code)
+        watched = self.nogoods.get(lit)
+        if not watched:
+            return None
+        assignments, literals = self.assignments, self._literals
+        kept = []
+        culprits = None
+        for i, nogood in enumerate(watched):
+            for other in nogood[0]:
+                if other == lit:
+                    continue
+                entry = assignments.get(other[0])
+                if entry is not None:
+                    cached = literals.get(other[0])
+                    if cached is not None and cached[0] is entry:
+                        if cached[1] == other:
+                            continue
+                    elif self._literal(other[0]) == other:
+                        continue
+                self.nogoods[other].append(nogood)
+                break
+            else:
+                kept.append(nogood)
+                if nogood[1] not in self.assignments:
+                    nogood[2] += 1
+                    self.solver_stats["nogood_hits"] += 1
+                    culprits = {other[0] for other in nogood[0]}
+                    kept.extend(watched[i + 1:])
+                    break
+        self.nogoods[lit] = kept
+        return culprits
+
+    def _backtrack(self, course_list, student_agenda, start_time):
+        """
+        Depth-first search over course_list, driven by an explicit stack of
+        choice points instead of recursion (no recursion-depth limit). Returns
+        True once every course is placed, False when the search failed or was
+        aborted (stop, timeout or the iteration cap) and None when it was
+        paused; _run_search continues a paused search.
+        With backjumping on, a failing node leaves in self.conflict_set the
+        courses that caused the failure (None = aborted). A choice point whose
+        course is not in that set cannot fix the failure, so it is closed
+        straight away and the search jumps back to the deepest culprit.
+        """
+        self._search = _Search(course_list, student_agenda, start_time)
+        return self._run_search()
+
+    def _run_search(self):
+        search = self._search
+        course_list, student_agenda, stack = search.course_list, search.agenda, search.stack
+        result = None  # None = enter a new node below the top of the stack
+        while True:
+            if result is None:
+                if self.pause_event.is_set():
+                    return None
+                node = self._open_node(course_list, len(stack), student_agenda, search.start_time)
+                if node is True or node is False:
+                    result = node
+                    continue
+                stack.append(node)
+            else:
+                # the node below the top of the stack finished with `result`
+                if result or not stack:
+                    self._search = None
+                    return result
+                node = stack[-1]
+                search.kept = min(search.kept, len(stack) - 1)
+                result = self._close_choice(node, student_agenda)
+                if result is not None:
+                    stack.pop()
+                    continue
+            result = self._next_choice(node, student_agenda)
+            if result is not None:
+                stack.pop()
+            elif len(stack) > len(self.partial):
+                self._record_partial(search)
+
+    def _record_partial(self, search):
+        """The stack is deeper than the best partial assignment: copy the part of it that changed."""
+        del self.partial[search.kept:]
+        self.partial.extend((n.course.code, n.day, n.slot, n.rooms) for n in search.stack[search.kept:])
+        search.kept = len(search.stack)
+
+    def keep_partial(self):
+        """
+        After a failed search: load the deepest partial assignment reached
+        into self.assignments and fill self.unscheduled with every course left
+        out and the scheduled courses blocking it (its conflict neighbours,
+        most shared students first; none = no room was free). When the
+        search ended in the timetable phase of two_phase, the partial exams
+        have no rooms yet and the summary says so.
+        Returns a summary for the solver message ("" when nothing was placed).
+        """
+        if not self.partial and not self.fixed:
+            return ""
+        self.assignments.clear()
+        self.assignments.update(self.fixed)
+        for code, d, s, rooms in self.partial:
+            self.assignments[code] = (d, s, rooms)
+        self.distribute_students()
+        weights = self.conflict_weights
+        self.unscheduled = {}
+        for c in self.courses:
+            if c.code not in self.assignments:
+                blocking = [o for o in self.conflict_matrix[c.code] if o in self.assignments]
+                blocking.sort(key=lambda o: (-weights[c.code].get(o, 0), o))
+                self.unscheduled[c.code] = blocking
+        self.solver_stats["unscheduled"] = len(self.unscheduled)
+        kept = "Best partial timetable kept (no rooms assigned yet)" if self.two_phase else "Best partial schedule kept"
+        lines = [f"{kept}: {len(self.assignments)} of {len(self.courses)} courses placed. Unscheduled:"]
+        for code in sorted(self.unscheduled)[:12]:
+            blocking = self.unscheduled[code]
+            reason = f"blocked by {', '.join(blocking[:6])}" + (" ..." if len(blocking) > 6 else "") if blocking else "no free rooms"
+            lines.append(f"- {code} ({reason})")
+        if len(self.unscheduled) > 12:
+            lines.append(f"... (+{len(self.unscheduled) - 12} more)")
+        return "\n".join(lines)
+
+    def _open_node(self, course_list, index, student_agenda, start_time):
+        """New node at depth `index`: True/False when it ends at once, otherwise its choice point."""
+        self.conflict_set = None
         if self.stop_event.is_set():
             return False
 
@@ -517,7 +2288,7 @@ class ScheduleSystem:
             return False
 
         self.iteration_count += 1
-        if self.iteration_count > self.MAX_ITERATIONS:
+        if self.iteration_count > self.node_limit:
             return False
 
         if self.progress_callback and self.iteration_count % 500 == 0:
@@ -526,42 +2297,166 @@ class ScheduleSystem:
         if index == len(course_list):
             return True
 
-        course = course_list[index]
-        slots_needed = self.get_slots_needed(course)
-        slots = [(d, s) for d in range(self.num_days) for s in range(self.slots_per_day - slots_needed + 1)]
-        slots.sort(key=lambda x: self.slot_usage_count[x])
-
-        for d, s in slots:
-            if not self.check_constraints(course, d, s, student_agenda):
-                continue
-
-            rooms = self.find_rooms(course, d, s)
-            if not rooms:
+        if self.ordering == "dynamic":
+            course = self.pick_next_course()
+        else:
+            course = course_list[index]
+        node = _ChoicePoint(course, self.exam_length[course.code])
+        spd = self.slots_per_day
+        candidates = self.candidate_masks[node.slots_needed]
+        own_conflicts = node.conflicts = set() if self.backjumping else None
+
+        if self.forward_checking:
+            # the live domain already reflects every student constraint
+            candidates = self._allowed_days(course, candidates, self.domains[course.code], own_conflicts)
+
+        if course.code in self.twins:
+            window, twins = self.twin_window(course.code)
+            if own_conflicts is not None and candidates & ~window:
+                own_conflicts |= twins
+            candidates &= window
+
+        if not self.forward_checking:
+            # every student constraint for all starts at once
+            allowed = student_agenda.start_mask(self.exam_students[course.code], node.slots_needed, spd)
+            candidates = self._allowed_days(course, candidates, allowed, own_conflicts)
+
+        if self.free_capacity is not None and not self.two_phase:
+            # not enough free seats in some slot: find_rooms would fail there
+            rooms_ok = self.room_start_mask(len(course.students), node.slots_needed)
+            if own_conflicts is not None:
+                for g in self._iter_bits([candidates & ~rooms_ok]):
+                    own_conflicts |= self._room_culprits(*divmod(g, spd), node.slots_needed)
+            candidates &= rooms_ok
+
+        starts = self.ordered_starts(candidates)
+        hint = self.warm_start.get(course.code)
+        if hint is not None:
+            h = hint[0] * spd + hint[1]
+            if (candidates >> h) & 1:
+                starts = itertools.chain((h,), (g for g in starts if g != h))
+        node.starts = starts
+        return node
+
+    def _allowed_days(self, course, candidates, allowed, own_conflicts):
+        """candidates & allowed; the neighbours on every day that lost a start become culprits."""
+        if own_conflicts is not None:
+            blocked = candidates & ~allowed
+            spd = self.slots_per_day
+            day_bits = (1 << spd) - 1
+            for d in range(self.num_days):
+                if (blocked >> (d * spd)) & day_bits:
+                    own_conflicts |= self._day_culprits(course, d)
+        return candidates & allowed
+
+    def _next_choice(self, node, student_agenda):
+        """
+        Place the course of `node` at its next start that passes every check
+        and return None (descend), or close the node and return False when no
+        start is left.
+        """
+        course, slots_needed, own_conflicts = node.course, node.slots_needed, node.conflicts
+        spd = self.slots_per_day
+        dynamic = self.ordering == "dynamic"
+        for g in node.starts:
+            d, s = divmod(g, spd)
+            if self.two_phase:
+                rooms = [] if self.seats_fit(course, g, slots_needed) else None
+            else:
+                rooms = self.find_rooms(course, d, s)
+            if rooms is None:
+                if own_conflicts is not None:
+                    own_conflicts |= self._room_culprits(d, s, slots_needed)
                 continue
 
-            self.assignments[course.code] = (d, s, rooms)
-            
-            # Mark all slots occupied by this multi-slot exam
-            for slot_offset in range(slots_needed):
-                self.slot_usage_count[(d, s + slot_offset)] += 1
-
-            for r in rooms:
-                for slot_offset in range(slots_needed):
-                    self.room_schedule[(d, s + slot_offset)].add(r.code)
-                self.room_usage_count[r.code] += slots_needed
-
-            for st in course.students:
-                student_agenda[st][d].append((s, slots_needed))
-
-            if self._backtrack(course_list, index + 1, student_agenda, start_time):
-                return True
-
-            del self.assignments[course.code]
-            for slot_offset in range(slots_needed):
-                self.slot_usage_count[(d, s + slot_offset)] -= 1
-            for r in rooms:
-                for slot_offset in range(slots_needed):
-                    self.room_schedule[(d, s + slot_offset)].remove(r.code)
-                self.room_usage_count[r.code] -= slots_needed
-            for st in course.students:
-                student_agenda[st][d].remove((s, slots_needed))
+            self.place_exam(course, d, s, rooms, slots_needed, student_agenda)
+            node.day, node.rooms = d, rooms
+            node.slot = s
+
+            if dynamic:
+                self.update_saturation(course, d, +1)
+
+            trail, consistent = None, True
+            if self.forward_checking:
+                trail, consistent = self.forward_check(course, d, student_agenda)
+                if dynamic and consistent:
+                    self._requeue(trail)
+                if own_conflicts is not None and not consistent:
+                    # the wiped-out neighbour is blocked by all of its assigned neighbours
+                    own_conflicts |= {c for c in self.conflict_matrix[self.wiped_course]
+                                      if c in self.assignments}
+            node.trail = trail
+
+            if consistent and self.room_cuts:
+                culprits = self.violated_room_cut(course.code, d, s)
+                if culprits is not None:
+                    consistent = False
+                    if own_conflicts is not None:
+                        own_conflicts |= culprits
+
+            if consistent and own_conflicts is not None and self.nogoods:
+                culprits = self.violated_nogood(course.code)
+                if culprits is not None:
+                    consistent = False
+                    own_conflicts |= culprits
+
+            if consistent:
+                return None
+            self._undo_choice(node, student_agenda)
+
+        if dynamic:
+            # every value failed: the course goes back to the queue for the parent node
+            self._push_course(course.code)
+        self.fail_count[course.code] += 1
+
+        if own_conflicts is not None:
+            own_conflicts.discard(course.code)
+            if self._aborted():
+                self.conflict_set = None
+            else:
+                self.learn_nogood(course, own_conflicts)
+                self.conflict_set = own_conflicts
+        return False
+
+    def _aborted(self):
+        """The run was stopped, timed out or hit its node limit: the search only unwinds."""
+        return self.stop_event.is_set() or self.iteration_count > self.node_limit
+
+    def _undo_choice(self, node, student_agenda):
+        """Take back the current start of `node` (undo log: domain trail, exam, rooms)."""
+        if node.trail:
+            self.restore_domains(node.trail)
+            if self.ordering == "dynamic":
+                self._requeue(node.trail)
+        if self.ordering == "dynamic":
+            self.update_saturation(node.course, node.day, -1)
+        self.remove_exam(node.course, node.day, node.slot, node.rooms, node.slots_needed, student_agenda)
+        node.trail = node.rooms = None
+
+    def _close_choice(self, node, student_agenda):
+        """
+        The subtree below the current start of `node` failed: undo the start.
+        Returns False when the node has to be closed too (aborted below, or a
+        backjump over it), None to go on with its next start.
+        """
+        child_conflicts = self.conflict_set
+        self._undo_choice(node, student_agenda)
+        own_conflicts = node.conflicts
+        code = node.course.code
+        if self._aborted():
+            # stop, timeout or node cap: unwind without trying other starts or learning anything
+            if self.ordering == "dynamic":
+                self._push_course(code)
+            self.conflict_set = None
+            return False
+        if own_conflicts is None:
+            return None
+        if code not in child_conflicts:
+            # no other value of this course can help: jump over it
+            self.solver_stats["backjumps"] += 1
+            if self.ordering == "dynamic":
+                self._push_course(code)
+            self.conflict_set = child_conflicts
+            return False
+        own_conflicts |= child_conflicts
+        return None
@@ -1,8 +1,11 @@
 # main.py
+import multiprocessing
 import tkinter as tk
 from gui import ExamSchedulerApp
 
 if __name__ == "__main__":
+    # needed by the parallel solver when the app is frozen into an .exe
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = ExamSchedulerApp(root)
     root.mainloop()
\ No newline at end of file
@@ -1,19 +1,41 @@
+import sys
+
+
+def intern_ids(student_ids):
+    """Student IDs as a tuple of interned strings, duplicates dropped (first occurrence kept)."""
+    return tuple(dict.fromkeys(sys.intern(str(st)) for st in student_ids))
+
+
 class Course:
+    # no per-instance __dict__: at university scale there are many courses and
+    # every student ID is shared (interned) across all the courses it appears in
+    __slots__ = ("code", "_students", "duration", "_explicit_duration")
+
     def __init__(self, code, student_ids=None, duration=None):
         self.code = code
-        self.students = list(set(student_ids or []))
+        self.students = student_ids or ()
         # duration in minutes. Defaults to None (will use slot duration)
         # _explicit_duration tracks if duration was explicitly set in course file
         self._explicit_duration = duration is not None
         self.duration = int(duration) if duration is not None else 60  # Default to 60 min if not specified
 
+    @property
+    def students(self):
+        return self._students
+
+    @students.setter
+    def students(self, student_ids):
+        self._students = intern_ids(student_ids)
+
     def __repr__(self):
         return f"{self.code} ({len(self.students)})"
 
 class Classroom:
+    __slots__ = ("code", "capacity")
+
     def __init__(self, code, capacity):
         self.code = code
         self.capacity = int(capacity)
 
     def __repr__(self):
-        return f"{self.code} [{self.capacity}]"
\ No newline at end of file
+        return f"{self.code} [{self.capacity}]"
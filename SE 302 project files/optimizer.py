@@ -0,0 +1,266 @@
+# optimizer.py
+"""
+Anytime improvement of a feasible schedule (soft constraints).
+
+Starts from a complete schedule that meets every hard constraint and runs
+simulated annealing on a weighted objective, lower is better:
+  - spread:  a student with two exams on one day, or on consecutive days
+  - rooms:   empty seats in the rooms an exam occupies, and exams split
+             over several rooms
+  - late:    students whose exam ends in the last slot of a day
+Only moves that keep the schedule feasible are tried (the hard check is the
+solver's StudentAgenda with the configured rules, plus a free-room bitmask per
+slot), so the best schedule seen so far is always a valid answer. Every move
+is scored by add/remove operations that return their own objective change,
+as in local_search, whose annealing loop (Annealer) drives the moves.
+
+Moves:
+  - shift: move one exam to another start, with the rooms that waste fewest seats
+  - swap:  exchange the starts of two exams of the same length
+  - rooms: re-pick the rooms of one exam at its start
+"""
+import random
+import time
+
+import room_packing
+from agenda import StudentAgenda
+from local_search import Annealer
+
+# objective weights (per student unless noted)
+W_SAME_DAY = 3.0      # two exams of a student on one day
+W_CONSECUTIVE = 1.0   # exams of a student on consecutive days
+W_EMPTY_SEAT = 0.02   # one empty seat for one slot
+W_EXTRA_ROOM = 0.5    # every room after the first of one exam (per exam)
+W_LATE = 0.2          # an exam ending in the last slot of its day
+
+
+class ScheduleOptimizer(Annealer):
+    def __init__(self, system, seed=None):
+        self.system = system
+        self.rng = random.Random(seed)
+        self.num_days = system.num_days
+        self.slots_per_day = system.slots_per_day
+
+        problem = system.problem
+        self.courses = problem.courses
+        self.index = problem.course_index
+        lengths = problem.lengths(system.slot_duration_minutes)
+        self.length = [lengths[c.code] for c in self.courses]
+        self.size = problem.size
+        self.classes = [problem.classes_of(i) for i in range(len(self.courses))]  # enrollment classes
+        self.class_size = problem.class_size
+        self.agenda = StudentAgenda(self.num_days, range(len(problem.class_courses)), system.student_rules())
+        self.day_count = [[0] * self.num_days for _ in problem.class_courses]  # class -> exams per day
+
+        self.rooms = sorted(system.classrooms, key=lambda r: -r.capacity)
+        self.room_cap = [r.capacity for r in self.rooms]
+        self.room_bit = {r.code: i for i, r in enumerate(self.rooms)}
+        self.free = [(1 << len(self.rooms)) - 1] * (self.num_days * self.slots_per_day)
+
+        # legal starts for every exam length
+        self.starts = {}
+        for n in set(self.length):
+            self.starts[n] = [(d, s) for d in range(self.num_days) for s in range(system.day_slots(d) - n + 1)]
+        self.same_length = {}
+        for i, n in enumerate(self.length):
+            self.same_length.setdefault(n, []).append(i)
+
+        self.pos = [None] * len(self.courses)  # (day, start)
+        self.room_of = [()] * len(self.courses)  # room indices
+        self.score = 0.0
+        self.best_score = None
+        self.best = None
+        self.iterations = 0
+
+    # ---------------- INCREMENTAL OBJECTIVE ----------------
+    def _student_cost(self, counts, d):
+        """Cost of one more exam on day d for a class with these day counts."""
+        cost = W_SAME_DAY * counts[d]
+        if d > 0:
+            cost += W_CONSECUTIVE * counts[d - 1]
+        if d + 1 < self.num_days:
+            cost += W_CONSECUTIVE * counts[d + 1]
+        return cost
+
+    def _exam_cost(self, i, d, s, rooms):
+        n = self.length[i]
+        empty = sum(self.room_cap[r] for r in rooms) - self.size[i]
+        cost = W_EMPTY_SEAT * empty * n + W_EXTRA_ROOM * max(len(rooms) - 1, 0)
+        day_slots = self.system.day_slots(d)
+        if day_slots > 1 and s + n == day_slots:
+            cost += W_LATE * self.size[i]
+        return cost
+
+    def _span(self, d, s, n):
+        g = d * self.slots_per_day + s
+        return range(g, g + n)
+
+    def add(self, i, d, s, rooms):
+        """Put exam i at (d, s) in `rooms` (no checks); returns the objective change."""
+        n = self.length[i]
+        delta = self._exam_cost(i, d, s, rooms)
+        for k in self.classes[i]:
+            counts = self.day_count[k]
+            delta += self.class_size[k] * self._student_cost(counts, d)
+            counts[d] += 1
+        self.agenda.add(self.classes[i], d, s, n)
+        taken = 0
+        for r in rooms:
+            taken |= 1 << r
+        for g in self._span(d, s, n):
+            self.free[g] &= ~taken
+        self.pos[i] = (d, s)
+        self.room_of[i] = rooms
+        self.score += delta
+        return delta
+
+    def remove(self, i):
+        """Take exam i out of the schedule; returns the objective change."""
+        d, s = self.pos[i]
+        n = self.length[i]
+        rooms = self.room_of[i]
+        delta = -self._exam_cost(i, d, s, rooms)
+        for k in self.classes[i]:
+            counts = self.day_count[k]
+            counts[d] -= 1
+            delta -= self.class_size[k] * self._student_cost(counts, d)
+        self.agenda.remove(self.classes[i], d, s, n)
+        taken = 0
+        for r in rooms:
+            taken |= 1 << r
+        for g in self._span(d, s, n):
+            self.free[g] |= taken
+        self.pos[i] = None
+        self.score += delta
+        return delta
+
+    def free_rooms(self, d, s, n):
+        free = -1
+        for g in self._span(d, s, n):
+            free &= self.free[g]
+        return free & ((1 << len(self.rooms)) - 1)
+
+    def pick_rooms(self, i, d, s):
+        """Room set with the fewest empty seats among the room_packing options; None if none covers the exam."""
+        options = room_packing.room_options(self.room_cap, self.size[i], self.free_rooms(d, s, self.length[i]))
+        if not options:
+            return None
+        return min(options, key=lambda rooms: (sum(self.room_cap[r] for r in rooms), len(rooms)))
+
+    def fits(self, i, d, s):
+        return self.agenda.fits(self.classes[i], d, s, self.length[i])
+
+    # ---------------- SETUP ----------------
+    def load(self, assignments):
+        """Start from {code: (day, slot, [Classroom])}; False if it is incomplete or breaks a hard constraint."""
+        for i, c in enumerate(self.courses):
+            entry = assignments.get(c.code)
+            if entry is None:
+                return False
+            d, s, rooms = entry
+            rooms = tuple(self.room_bit[r.code] for r in rooms)
+            n = self.length[i]
+            if s + n > self.system.day_slots(d) or not self.fits(i, d, s):
+                return False
+            if sum(self.room_cap[r] for r in rooms) < self.size[i]:
+                return False
+            if any((self.free_rooms(d, s, n) >> r) & 1 == 0 for r in rooms):
+                return False
+            self.add(i, d, s, rooms)
+        self._keep_best()
+        return True
+
+    def _keep_best(self):
+        self.best_score = self.score
+        self.best = (list(self.pos), list(self.room_of))
+
+    # ---------------- MOVES ----------------
+    def _place(self, i, d, s, rooms=None):
+        """add() after the hard check; returns the objective change or None (nothing changed)."""
+        if not self.fits(i, d, s):
+            return None
+        if rooms is None:
+            rooms = self.pick_rooms(i, d, s)
+            if rooms is None:
+                return None
+        return self.add(i, d, s, rooms)
+
+    def move_shift(self):
+        i = self.rng.randrange(len(self.courses))
+        target = self.rng.choice(self.starts[self.length[i]])
+        old = (self.pos[i], self.room_of[i])
+        if target == old[0]:
+            return None
+        delta = self.remove(i)
+        placed = self._place(i, *target)
+        if placed is None:
+            self.add(i, old[0][0], old[0][1], old[1])
+            return None
+        return delta + placed, [(i, old)]
+
+    def move_swap(self):
+        i = self.rng.randrange(len(self.courses))
+        j = self.rng.choice(self.same_length[self.length[i]])
+        if self.pos[i] == self.pos[j]:
+            return None
+        old = [(i, (self.pos[i], self.room_of[i])), (j, (self.pos[j], self.room_of[j]))]
+        delta = self.remove(i) + self.remove(j)
+        first = self._place(i, *old[1][1][0])
+        second = self._place(j, *old[0][1][0]) if first is not None else None
+        if second is None:
+            if first is not None:
+                self.remove(i)
+            self._restore(old)
+            return None
+        return delta + first + second, old
+
+    def move_rooms(self):
+        i = self.rng.randrange(len(self.courses))
+        (d, s), rooms = self.pos[i], self.room_of[i]
+        delta = self.remove(i)
+        options = room_packing.room_options(self.room_cap, self.size[i], self.free_rooms(d, s, self.length[i]))
+        options = [o for o in options if o != rooms]
+        if not options:
+            self.add(i, d, s, rooms)
+            return None
+        return delta + self.add(i, d, s, self.rng.choice(options)), [(i, ((d, s), rooms))]
+
+    def _restore(self, old):
+        for a, ((d, s), rooms) in old:
+            self.add(a, d, s, rooms)
+
+    def undo(self, old):
+        for a, _ in old:
+            self.remove(a)
+        self._restore(old)
+
+    # ---------------- DRIVER ----------------
+    def accepted(self):
+        if self.score < self.best_score - 1e-9:
+            self._keep_best()
+
+    def run(self, deadline, stop_event=None, progress_callback=None, score_callback=None, t_end=1e-3):
+        """
+        Simulated annealing until the deadline or a stop request; keeps the
+        best schedule seen. Every 1000 iterations progress_callback(iterations,
+        elapsed) and score_callback(best_score) are called.
+        """
+        start = time.time()
+        if not self.courses:
+            return
+
+        def report(iterations, elapsed):
+            if progress_callback:
+                progress_callback(iterations, elapsed)
+            if score_callback:
+                score_callback(self.best_score)
+
+        moves = (self.move_shift, self.move_shift, self.move_swap, self.move_rooms)
+        t_start = max(self.score / len(self.courses), 1e-3)
+        self.anneal(moves, start, deadline, t_start, t_end, stop_event, report)
+
+    def export(self):
+        """Best schedule in ScheduleSystem form: code -> (day, start, [Classroom])."""
+        pos, room_of = self.best
+        return {c.code: (pos[i][0], pos[i][1], [self.rooms[r] for r in room_of[i]])
+                for i, c in enumerate(self.courses)}
@@ -0,0 +1,266 @@
+# parallel.py
+"""
+Multi-process helpers for the solver.
+
+Worker processes get a plain snapshot of the problem (courses, classrooms,
+calendar settings and student-load rules), build their own ScheduleSystem without a database and send
+back assignments as room codes, which the parent maps onto its own objects.
+The "spawn" start method is used everywhere so Windows and Linux behave the
+same and the Tk process is never forked.
+"""
+import multiprocessing as mp
+import os
+import queue
+import random
+import threading
+import time
+
+import room_packing
+from logic import ScheduleSystem
+
+# Search settings tried by the portfolio workers, in this order (cycled).
+PORTFOLIO_HEURISTICS = [
+    {"ordering": "dynamic"},
+    {"ordering": "dynamic", "backjumping": True},
+    {"forward_checking": True},
+    {},
+    {"forward_checking": True, "backjumping": True},
+    {"backjumping": True},
+    {"ordering": "dynamic", "backjumping": True, "restarts": "luby"},
+]
+
+
+def problem_snapshot(system):
+    return {
+        "courses": system.courses,
+        "classrooms": system.classrooms,
+        "num_days": system.num_days,
+        "slots_per_day": system.slots_per_day,
+        "total_slots": system.total_slots,
+        "slot_duration_minutes": system.slot_duration_minutes,
+        "max_exams_per_day": system.max_exams_per_day,
+        "min_gap_slots": system.min_gap_slots,
+        "max_exams_per_48h": system.max_exams_per_48h,
+        "max_iterations": system.MAX_ITERATIONS,
+    }
+
+
+def make_worker_system(snapshot):
+    system = ScheduleSystem(use_db=False)
+    system.courses = list(snapshot["courses"])
+    system.classrooms = list(snapshot["classrooms"])
+    system.num_days = snapshot["num_days"]
+    system.slots_per_day = snapshot["slots_per_day"]
+    system.total_slots = snapshot["total_slots"]
+    system.slot_duration_minutes = snapshot["slot_duration_minutes"]
+    system.max_exams_per_day = snapshot["max_exams_per_day"]
+    system.min_gap_slots = snapshot["min_gap_slots"]
+    system.max_exams_per_48h = snapshot["max_exams_per_48h"]
+    system.MAX_ITERATIONS = snapshot["max_iterations"]
+    return system
+
+
+def export_assignments(system):
+    return {code: (d, s, [r.code for r in rooms]) for code, (d, s, rooms) in system.assignments.items()}
+
+
+def _watch_stop(shared_stop, stop):
+    # Poll instead of shared_stop.wait(): a process that exits while blocked in
+    # wait() stays registered as a sleeper and makes set() in the parent hang.
+    while not shared_stop.is_set():
+        time.sleep(0.05)
+    # solve() clears its own stop_event when it starts, so keep re-setting it
+    while True:
+        stop()
+        time.sleep(0.05)
+
+
+class LinkedStop(threading.Event):
+    """
+    Own stop flag for a subproblem solved in the parent process: its timeout
+    sets only this event, while a stop() of the parent (checked on every
+    is_set) still stops it.
+    """
+
+    def __init__(self, parent):
+        super().__init__()
+        self.parent = parent
+
+    def is_set(self):
+        return super().is_set() or self.parent.is_set()
+
+
+def _portfolio_worker(worker_id, snapshot, seed, options, time_limit_sec, shared_stop, results):
+    system = make_worker_system(snapshot)
+    threading.Thread(target=_watch_stop, args=(shared_stop, system.stop), daemon=True).start()
+    if shared_stop.is_set():
+        return
+    try:
+        success, msg = system.solve(time_limit_sec=time_limit_sec, seed=seed, **options)
+    except Exception as e:
+        success, msg = False, f"CRASH PREVENTED: {e}"
+    results.put((worker_id, success, msg, export_assignments(system) if success else None, system.solver_stats))
+
+
+def run_portfolio(system, time_limit_sec=25, workers=None, seed=None):
+    """
+    Race `workers` seeded searches (one per core by default) on the problem held
+    by `system`. The first feasible schedule wins and every other worker is
+    told to stop. Returns (success, msg, assignments-by-room-code, info).
+    """
+    workers = workers or os.cpu_count() or 1
+    base_seed = seed if seed is not None else random.randrange(1 << 30)
+    ctx = mp.get_context("spawn")
+    shared_stop = ctx.Event()
+    results = ctx.Queue()
+    snapshot = problem_snapshot(system)
+
+    procs = []
+    for i in range(workers):
+        options = PORTFOLIO_HEURISTICS[i % len(PORTFOLIO_HEURISTICS)]
+        p = ctx.Process(target=_portfolio_worker,
+                        args=(i, snapshot, base_seed + i, options, time_limit_sec, shared_stop, results),
+                        daemon=True)
+        p.start()
+        procs.append((p, options, base_seed + i))
+
+    deadline = time.time() + time_limit_sec
+    winner = None
+    last_msg = "Stopped (timeout / user)"
+    finished = 0
+    while finished < workers:
+        if system.stop_event.is_set() or time.time() > deadline:
+            break
+        try:
+            worker_id, success, msg, assignments, stats = results.get(timeout=0.1)
+        except queue.Empty:
+            if not any(p.is_alive() for p, _, _ in procs) and results.empty():
+                break
+            continue
+        finished += 1
+        if success:
+            winner = (worker_id, msg, assignments, stats)
+            break
+        # a proven "No Solution" beats a timeout message
+        if not last_msg.startswith("No Solution"):
+            last_msg = msg
+
+    shared_stop.set()
+    for p, _, _ in procs:
+        p.join(timeout=2)
+        if p.is_alive():
+            p.terminate()
+
+    if winner is None:
+        if system.stop_event.is_set() or time.time() > deadline:
+            last_msg = "Stopped (timeout / user)"
+        return False, last_msg, None, {"workers": workers}
+
+    worker_id, msg, assignments, stats = winner
+    _, options, worker_seed = procs[worker_id]
+    info = dict(stats)
+    info.update({"workers": workers, "winner": worker_id, "winner_options": options, "winner_seed": worker_seed})
+    return True, msg, assignments, info
+
+
+def pack_clusters(capacities, clusters, workers=None):
+    """Phase two of the two-phase solve: pack every time cluster in a process pool."""
+    workers = min(workers or os.cpu_count() or 1, len(clusters))
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(workers) as pool:
+        return pool.starmap(room_packing.pack_cluster, [(capacities, cluster) for cluster in clusters])
+
+
+def solve_subproblem(snapshot, codes, settings, options, time_limit_sec, stop_event=None):
+    """
+    Solve the courses `codes` only, with the ScheduleSystem attributes in
+    `settings` overridden (e.g. seat_capacity, or num_days=1 for one day).
+    Returns (success, msg, assignments by room code).
+    """
+    codes = set(codes)
+    sub = dict(snapshot, courses=[c for c in snapshot["courses"] if c.code in codes])
+    system = make_worker_system(sub)
+    if stop_event is not None:
+        system.stop_event = stop_event
+    for name, value in settings.items():
+        setattr(system, name, value)
+    success, msg = system.solve(time_limit_sec=time_limit_sec, **options)
+    return success, msg, export_assignments(system) if success else None
+
+
+def _subproblem_worker(jobs, snapshot, options, time_limit_sec, shared_stop, results):
+    system_stop = threading.Event()
+    threading.Thread(target=_watch_stop, args=(shared_stop, system_stop.set), daemon=True).start()
+    deadline = time.time() + time_limit_sec
+    for job_id, codes, settings in jobs:
+        if shared_stop.is_set():
+            return
+        try:
+            success, msg, assignments = solve_subproblem(snapshot, codes, settings, options,
+                                                         max(deadline - time.time(), 0.1), system_stop)
+        except Exception as e:
+            success, msg, assignments = False, f"CRASH PREVENTED: {e}", None
+        results.put((job_id, success, msg, assignments))
+
+
+def run_subproblems(system, jobs, options, time_limit_sec=25, workers=None, stop_on_failure=True):
+    """
+    Solve independent subproblems, jobs = [(course codes, settings)], in worker
+    processes; jobs are dealt to the workers largest first. With
+    stop_on_failure the first failure cancels the rest.
+    Returns one (success, msg, assignments) per job, None for jobs that did
+    not finish (timeout, stop() or cancelled).
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+    snapshot = problem_snapshot(system)
+    deadline = time.time() + time_limit_sec
+    results = [None] * len(jobs)
+
+    if workers == 1:
+        for job_id, (codes, settings) in enumerate(jobs):
+            if system.stop_event.is_set() or time.time() > deadline:
+                break
+            # a day that times out must not stop the parent, so each job gets its own flag
+            results[job_id] = solve_subproblem(snapshot, codes, settings, options,
+                                               max(deadline - time.time(), 0.1), LinkedStop(system.stop_event))
+            if stop_on_failure and not results[job_id][0]:
+                break
+        return results
+
+    dealt = [[] for _ in range(workers)]
+    load = [0] * workers
+    for job_id in sorted(range(len(jobs)), key=lambda j: len(jobs[j][0]), reverse=True):
+        w = load.index(min(load))
+        dealt[w].append((job_id, jobs[job_id][0], jobs[job_id][1]))
+        load[w] += len(jobs[job_id][0])
+
+    ctx = mp.get_context("spawn")
+    shared_stop = ctx.Event()
+    queue_ = ctx.Queue()
+    procs = [ctx.Process(target=_subproblem_worker,
+                         args=(dealt[w], snapshot, options, time_limit_sec, shared_stop, queue_), daemon=True)
+             for w in range(workers)]
+    for p in procs:
+        p.start()
+
+    done = 0
+    while done < len(jobs):
+        if system.stop_event.is_set() or time.time() > deadline:
+            break
+        try:
+            job_id, success, msg, assignments = queue_.get(timeout=0.1)
+        except queue.Empty:
+            if not any(p.is_alive() for p in procs) and queue_.empty():
+                break
+            continue
+        done += 1
+        results[job_id] = (success, msg, assignments)
+        if stop_on_failure and not success:
+            break
+
+    shared_stop.set()
+    for p in procs:
+        p.join(timeout=2)
+        if p.is_alive():
+            p.terminate()
+    return results
@@ -0,0 +1,197 @@
+# problem.py
+"""
+Compiled, read-only form of the loaded data, shared by the solver code.
+
+Student IDs, course codes and rooms are interned to dense ints, and the
+enrollments are kept as CSR arrays (array module, no extra dependency):
+  course i  takes students enroll_students[enroll_ptr[i]:enroll_ptr[i + 1]]
+  student k takes courses  student_courses[student_ptr[k]:student_ptr[k + 1]]
+
+Students with exactly the same courses are collapsed into one enrollment
+class (same program and year, usually). Every student constraint depends on
+the course set only, so the solvers keep one agenda row per class:
+  class j   = students with courses class_courses[j], class_size[j] of them
+  course i  has classes    enroll_classes[class_ptr[i]:class_ptr[i + 1]]
+
+ScheduleSystem.problem builds one and keeps it until the loaded data changes
+(ScheduleSystem.invalidate), so the conflict graph and the exam lengths are
+computed once per data set.
+"""
+import math
+from array import array
+from collections import defaultdict
+
+
+def slots_needed(course, slot_duration_minutes):
+    """
+    Consecutive slots an exam needs: its explicit duration (from the courses
+    file) rounded up to whole slots, otherwise exactly one slot.
+    """
+    if getattr(course, "_explicit_duration", False):
+        return max(1, math.ceil(course.duration / slot_duration_minutes))
+    return 1
+
+
+class ProblemInstance:
+    def __init__(self, courses, classrooms):
+        self.courses = list(courses)
+        self.classrooms = list(classrooms)
+
+        self.course_codes = [c.code for c in self.courses]
+        self.course_index = {code: i for i, code in enumerate(self.course_codes)}
+        self.course_by_code = dict(zip(self.course_codes, self.courses))
+        self.room_codes = [r.code for r in self.classrooms]
+        self.room_index = {code: i for i, code in enumerate(self.room_codes)}
+        self.room_capacity = array("l", (r.capacity for r in self.classrooms))
+
+        # course -> students (CSR), interning student IDs on the way
+        self.student_ids = []
+        self.student_index = {}
+        self.enroll_ptr = array("l", [0])
+        self.enroll_students = array("l")
+        for c in self.courses:
+            for st in c.students:
+                k = self.student_index.get(st)
+                if k is None:
+                    k = self.student_index[st] = len(self.student_ids)
+                    self.student_ids.append(st)
+                self.enroll_students.append(k)
+            self.enroll_ptr.append(len(self.enroll_students))
+        self.size = array("l", (self.enroll_ptr[i + 1] - self.enroll_ptr[i] for i in range(len(self.courses))))
+
+        # student -> courses (the transpose)
+        counts = [0] * (len(self.student_ids) + 1)
+        for k in self.enroll_students:
+            counts[k + 1] += 1
+        for k in range(len(self.student_ids)):
+            counts[k + 1] += counts[k]
+        self.student_ptr = array("l", counts)
+        self.student_courses = array("l", [0]) * len(self.enroll_students)
+        fill = counts[:-1]
+        for i in range(len(self.courses)):
+            for p in range(self.enroll_ptr[i], self.enroll_ptr[i + 1]):
+                k = self.enroll_students[p]
+                self.student_courses[fill[k]] = i
+                fill[k] += 1
+
+        # enrollment classes: students grouped by their course set
+        self.class_of = array("l", [0]) * len(self.student_ids)
+        self.class_courses = []   # class -> list of course codes
+        self.class_size = array("l")
+        self.class_rep = array("l")  # one student of every class
+        signature_class = {}
+        for k in range(len(self.student_ids)):
+            signature = self.courses_of(k).tobytes()
+            j = signature_class.get(signature)
+            if j is None:
+                j = signature_class[signature] = len(self.class_courses)
+                self.class_courses.append([self.course_codes[i] for i in self.courses_of(k)])
+                self.class_size.append(0)
+                self.class_rep.append(k)
+            self.class_of[k] = j
+            self.class_size[j] += 1
+        self.class_ptr = array("l", [0])
+        self.enroll_classes = array("l")
+        for i in range(len(self.courses)):
+            seen = dict.fromkeys(self.class_of[k] for k in self.students_of(i))
+            self.enroll_classes.extend(seen)
+            self.class_ptr.append(len(self.enroll_classes))
+
+        self._enrolled = None
+        self._lengths = {}
+        self._conflicts = None
+        self._duplicates = None
+
+    # ---- LOOKUPS ----------------
+    def course(self, code):
+        """Course object by code, or None."""
+        return self.course_by_code.get(code)
+
+    def students_of(self, i):
+        """Interned students of course i."""
+        return self.enroll_students[self.enroll_ptr[i]:self.enroll_ptr[i + 1]]
+
+    def courses_of(self, k):
+        """Course indices taken by interned student k."""
+        return self.student_courses[self.student_ptr[k]:self.student_ptr[k + 1]]
+
+    def courses_of_student(self, student_id):
+        """Course codes taken by a student ID ([] for an unknown student)."""
+        k = self.student_index.get(student_id)
+        if k is None:
+            return []
+        return [self.course_codes[i] for i in self.courses_of(k)]
+
+    def classes_of(self, i):
+        """Enrollment classes of course i."""
+        return self.enroll_classes[self.class_ptr[i]:self.class_ptr[i + 1]]
+
+    def enrolled(self):
+        """course code -> enrollment classes, built once."""
+        if self._enrolled is None:
+            self._enrolled = {code: self.classes_of(i) for i, code in enumerate(self.course_codes)}
+        return self._enrolled
+
+    def compression(self):
+        """Students per enrollment class (1.0 = every student has a different course set)."""
+        return len(self.student_ids) / max(len(self.class_courses), 1)
+
+    def duplicate_courses(self):
+        """
+        Groups of course indices with exactly the same students (cross-listed
+        sections), in course order; courses without students are left out.
+        """
+        if self._duplicates is None:
+            by_students = {}
+            for i in range(len(self.courses)):
+                if self.size[i]:
+                    signature = array("l", sorted(self.students_of(i))).tobytes()
+                    by_students.setdefault(signature, []).append(i)
+            self._duplicates = [group for group in by_students.values() if len(group) > 1]
+        return self._duplicates
+
+    def room_groups(self):
+        """capacity -> codes of the rooms with that capacity (interchangeable rooms)."""
+        groups = defaultdict(list)
+        for code, capacity in zip(self.room_codes, self.room_capacity):
+            groups[capacity].append(code)
+        return dict(groups)
+
+    def lengths(self, slot_duration_minutes):
+        """course code -> slots needed, cached per slot duration."""
+        lengths = self._lengths.get(slot_duration_minutes)
+        if lengths is None:
+            lengths = self._lengths[slot_duration_minutes] = {
+                c.code: slots_needed(c, slot_duration_minutes) for c in self.courses}
+        return lengths
+
+    # ---- CONFLICT GRAPH ----------------
+    def conflicts(self):
+        """
+        Conflict graph from the enrollment classes, built once:
+        (conflict_matrix[a] = set of codes, conflict_weights[a][b] = shared
+        students, class_courses). Every class adds an edge between each pair
+        of its courses, so the cost follows distinct enrollment profiles, not
+        C^2 * S.
+        """
+        if self._conflicts is None:
+            conflict_matrix = defaultdict(set)
+            conflict_weights = defaultdict(dict)
+            for j, taken in enumerate(self.class_courses):
+                weight = self.class_size[j]
+                n = len(taken)
+                for x in range(n):
+                    a = taken[x]
+                    neighbours_a = conflict_matrix[a]
+                    weights_a = conflict_weights[a]
+                    for y in range(x + 1, n):
+                        b = taken[y]
+                        if a == b:
+                            continue
+                        neighbours_a.add(b)
+                        conflict_matrix[b].add(a)
+                        weights_a[b] = weights_a.get(b, 0) + weight
+                        weights_b = conflict_weights[b]
+                        weights_b[a] = weights_b.get(a, 0) + weight
+            self._conflicts = (conflict_matrix, conflict_weights, self.class_courses)
+        return self._conflicts
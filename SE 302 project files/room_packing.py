@@ -0,0 +1,147 @@
+# room_packing.py
+"""
+Room assignment for a fixed timetable (phase two of the two-phase solve).
+
+Exams on the same day whose slots overlap form a cluster. Two clusters never
+compete for a room in the same slot, so each cluster is packed on its own
+(and clusters can be packed in parallel).
+
+Plain data only, so it can be sent to worker processes:
+  capacities: room capacities sorted largest first; room i = bit i of a mask
+  exam:       (key, day, start, num_slots, seats)
+"""
+
+SEARCH_NODE_LIMIT = 20_000  # per cluster, after first-fit decreasing failed
+MAX_OPTIONS = 6             # room sets tried per exam in the exact search
+GAVE_UP = "gave up"         # pack_cluster hit SEARCH_NODE_LIMIT: nothing is known about the cluster
+
+
+def time_clusters(exams):
+    """Split exams into clusters of exams that overlap in time on the same day."""
+    clusters = []
+    current, current_day, current_end = None, None, None
+    for exam in sorted(exams, key=lambda e: (e[1], e[2])):
+        _, day, start, num_slots, _ = exam
+        if current is None or day != current_day or start >= current_end:
+            current = []
+            clusters.append(current)
+            current_day, current_end = day, start + num_slots
+        current.append(exam)
+        current_end = max(current_end, start + num_slots)
+    return clusters
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def cover(capacities, need, free):
+    """Largest free rooms first until `need` seats are covered; None if they cannot be."""
+    picked, cap = [], 0
+    for i in _bits(free):
+        picked.append(i)
+        cap += capacities[i]
+        if cap >= need:
+            return tuple(picked)
+    return None
+
+
+def room_options(capacities, need, free):
+    """
+    Candidate room sets for one exam, best first:
+    the smallest single room that fits (best fit), then the largest-first
+    cover using only rooms no larger than room i, for each free room i.
+    """
+    options = []
+    best_fit = None
+    for i in _bits(free):
+        if capacities[i] >= need:
+            best_fit = i
+    if best_fit is not None:
+        options.append((best_fit,))
+    for i in _bits(free):
+        rooms = cover(capacities, need, free & ~((1 << i) - 1))
+        if rooms is None:
+            break
+        if rooms not in options:
+            options.append(rooms)
+            if len(options) >= MAX_OPTIONS:
+                break
+    return options
+
+
+def pack_cluster(capacities, exams):
+    """
+    Rooms for every exam of one cluster: {key: (room indices)}; None when no
+    combination of the room sets tried (room_options) packs, GAVE_UP when the
+    search hit SEARCH_NODE_LIMIT first. Neither is a proof that the cluster
+    cannot be packed: only MAX_OPTIONS room sets are tried per exam.
+    Exams go largest first; the first branch of the search is first-fit
+    decreasing (best fit), the rest is a bounded depth-first search over the
+    other room sets. Two rooms with the same capacity that are free in the
+    same slots of the cluster are interchangeable, so room sets that differ
+    only by such a swap are tried once.
+    """
+    exams = sorted(exams, key=lambda e: (-e[4], e[2]))
+    all_rooms = (1 << len(capacities)) - 1
+    free = {}
+    for _, _, start, num_slots, _ in exams:
+        for s in range(start, start + num_slots):
+            free[s] = all_rooms
+    cluster_slots = sorted(free)
+    result = {}
+    nodes = [0]
+
+    def place(k):
+        if k == len(exams):
+            return True
+        nodes[0] += 1
+        if nodes[0] > SEARCH_NODE_LIMIT:
+            return False
+        key, _, start, num_slots, seats = exams[k]
+        slots = range(start, start + num_slots)
+        mask = all_rooms
+        for s in slots:
+            mask &= free[s]
+        seen = set()
+        for rooms in room_options(capacities, seats, mask):
+            shape = tuple(sorted((capacities[i],) + tuple(free[s] >> i & 1 for s in cluster_slots) for i in rooms))
+            if shape in seen:
+                continue
+            seen.add(shape)
+            taken = 0
+            for i in rooms:
+                taken |= 1 << i
+            for s in slots:
+                free[s] &= ~taken
+            result[key] = rooms
+            if place(k + 1):
+                return True
+            for s in slots:
+                free[s] |= taken
+        result.pop(key, None)
+        return False
+
+    if place(0):
+        return dict(result)
+    return GAVE_UP if nodes[0] > SEARCH_NODE_LIMIT else None
+
+
+def minimal_conflict(capacities, exams):
+    """
+    Shrink a cluster pack_cluster found no packing for (None) to a subset it
+    still finds none for, but packs as soon as any one exam is left out
+    (deletion filter; a subset that gives up keeps the exam).
+    """
+    core = sorted(exams, key=lambda e: e[4])
+    i = 0
+    while i < len(core):
+        rest = core[:i] + core[i + 1:]
+        if rest and pack_cluster(capacities, rest) is None:
+            core = rest
+        else:
+            i += 1
+    return core
@@ -0,0 +1,76 @@
+# test_logic.py
+"""
+Regression tests for the scheduling logic.
+
+Run from this folder with:  python -m unittest test_logic
+"""
+import unittest
+
+from logic import ScheduleSystem
+from models import Course, Classroom
+
+
+def make_system(courses, num_days=3, slots_per_day=4, **settings):
+    system = ScheduleSystem(use_db=False)
+    system.courses = courses
+    system.classrooms = [Classroom("R1", 50), Classroom("R2", 50)]
+    system.num_days = num_days
+    system.slots_per_day = slots_per_day
+    for name, value in settings.items():
+        setattr(system, name, value)
+    return system
+
+
+class DayCulpritsTest(unittest.TestCase):
+    def test_exam_on_neighbouring_day_is_a_culprit(self):
+        # with one exam per 48 hours the exam of "A" on day 0 closes day 1 for "B"
+        a, b = Course("A", ["S1", "S2"]), Course("B", ["S1", "S3"])
+        system = make_system([a, b], max_exams_per_48h=1)
+        success, msg = system.solve(time_limit_sec=5, backjumping=True)
+        self.assertTrue(success, msg)
+
+        agenda = system.start_search(system.courses)
+        room = system.classrooms[0]
+        system.place_exam(a, 0, 0, [room], 1, agenda)
+        spd = system.slots_per_day
+        # only day 1 is a candidate (as inside a twin window): day 0 never loses a start
+        candidates = ((1 << spd) - 1) << spd
+        allowed = agenda.start_mask(system.exam_students["B"], 1, spd)
+        conflicts = set()
+        self.assertEqual(system._allowed_days(b, candidates, allowed, conflicts), 0)
+        self.assertEqual(conflicts, {"A"})
+
+    def test_no_neighbouring_days_without_48h_rule(self):
+        a, b = Course("A", ["S1"]), Course("B", ["S1"])
+        system = make_system([a, b], max_exams_per_day=1)
+        success, msg = system.solve(time_limit_sec=5, backjumping=True)
+        self.assertTrue(success, msg)
+
+        agenda = system.start_search(system.courses)
+        system.place_exam(a, 1, 0, [system.classrooms[0]], 1, agenda)
+        self.assertEqual(system._day_culprits(b, 0), set())
+        self.assertEqual(system._day_culprits(b, 1), {"A"})
+
+
+class ProblemCacheTest(unittest.TestCase):
+    def test_edit_in_place_then_invalidate(self):
+        a, b = Course("A", ["S1"]), Course("B", ["S2"])
+        system = make_system([a, b])
+        self.assertEqual(system.problem.conflicts()[0]["A"], set())
+        b.students = ["S2", "S1"]
+        system.invalidate()
+        self.assertEqual(system.problem.conflicts()[0]["A"], {"B"})
+
+    def test_leads_only_reuses_the_reduced_problem(self):
+        system = make_system([Course("A", ["S1"]), Course("A2", ["S1"]), Course("B", ["S2"])])
+        full = system.problem
+        with system.leads_only({"A2"}):
+            reduced = system.problem
+            self.assertEqual(reduced.course_codes, ["A", "B"])
+        self.assertIs(system.problem, full)
+        with system.leads_only({"A2"}):
+            self.assertIs(system.problem, reduced)
+
+
+if __name__ == "__main__":
+    unittest.main()